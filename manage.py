@@ -5,6 +5,9 @@ import sys
 
 
 def main():
+    # The test suite adds databases of its own, see todo/test_settings.py.
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo.settings')
     try:
         from django.core.management import execute_from_command_line
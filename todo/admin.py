@@ -1,3 +1,375 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponseRedirect, QueryDict
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from todo.models import (
+    Reminder, Todo, TodoList, TodoListMember, TodoListStats, VersionConflict,
+)
+from todo.routers import db_for, is_sharded
+from todo.writebehind import get_queue
+
+
+class BoundedCountPaginator(Paginator):
+    """Counts at most TODO_ADMIN_COUNT_LIMIT rows of a changelist.
+
+    SQLite answers COUNT(*) by reading the whole table or index. Pages past
+    the limit are not linked, filters narrow the results instead.
+    """
+
+    @cached_property
+    def count(self):
+        return self.object_list[:settings.TODO_ADMIN_COUNT_LIMIT].count()
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Picks the shard a changelist reads, see ScalableAdmin.shard()."""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in settings.TODO_SHARDS]
+
+    def queryset(self, request, queryset):
+        # ScalableAdmin.get_queryset() already reads from the shard.
+        return queryset
+
+    def choices(self, changelist):
+        # Every row lives on exactly one shard, so there is no "All".
+        current = self.value() or settings.TODO_SHARDS[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({
+                    self.parameter_name: alias,
+                }),
+                'display': title,
+            }
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist settings that stay fast on tables with millions of rows.
+
+    With sharding on, the admin works on one shard at a time. Changelists
+    pick it with ShardFilter, and the links to change and delete objects
+    carry it along in the preserved changelist filters.
+    """
+    paginator = BoundedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+    delete_confirmation_template = 'admin/todo/delete_confirmation.html'
+
+    def shard(self, request):
+        """The database alias this request reads and writes."""
+        if not settings.TODO_SHARDS:
+            return DEFAULT_DB_ALIAS
+        shard = request.GET.get(ShardFilter.parameter_name)
+        if shard is None:
+            shard = QueryDict(request.GET.get('_changelist_filters', '')).get(
+                ShardFilter.parameter_name,
+            )
+        if shard in settings.TODO_SHARDS:
+            return shard
+        return settings.TODO_SHARDS[0]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(self.shard(request))
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if settings.TODO_SHARDS:
+            return (ShardFilter, *list_filter)
+        return list_filter
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if is_sharded(db_field.related_model):
+            kwargs['using'] = self.shard(request)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        # New objects may go to another shard than the changelist showed,
+        # see TodoListAdmin.save_model(). Redirects follow them there.
+        if settings.TODO_SHARDS:
+            filters = QueryDict(
+                request.GET.get('_changelist_filters', ''), mutable=True,
+            )
+            filters[ShardFilter.parameter_name] = obj._state.db
+            request.GET = request.GET.copy()
+            request.GET['_changelist_filters'] = filters.urlencode()
+        return super().response_add(request, obj, post_url_continue)
+
+    def get_actions(self, request):
+        # The stock delete action lists every object and cascade it would
+        # delete before asking for confirmation.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        """Count what deleting ``objs`` takes along, by model.
+
+        The stock delete page loads and links every cascaded object, all
+        the todos of a list included.
+        """
+        perms_needed = set()
+        model_count = {}
+        for model, count in self.deleted_counts(objs):
+            model_admin = self.admin_site._registry.get(model)
+            if (count and model_admin is not None and
+                    not model_admin.has_delete_permission(request)):
+                perms_needed.add(model._meta.verbose_name)
+            model_count[model._meta.verbose_name_plural] = count
+        return [], model_count, perms_needed, []
+
+    def deleted_counts(self, objs):
+        """(model, count) pairs of the objects deleting ``objs`` deletes."""
+        return [(self.model, len(objs))]
+
+    def flush_pending(self):
+        """Write pending updates first so they cannot undo an admin write."""
+        queue = get_queue()
+        if queue is not None:
+            queue.flush()
+
+    def response_action(self, request, queryset):
+        self.flush_pending()
+        return super().response_action(request, queryset)
+
+    def changeform_view(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            self.flush_pending()
+        return super().changeform_view(request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            self.flush_pending()
+        return super().delete_view(request, *args, **kwargs)
+
+    def confirm_delete(self, request, queryset, delete):
+        """Ask for confirmation showing only a count, then call ``delete``."""
+        opts = self.model._meta
+        if request.POST.get('confirmed'):
+            deleted = delete(queryset)
+            self.message_user(request, 'Deleted %d %s.' % (
+                deleted, opts.verbose_name_plural,
+            ), messages.SUCCESS)
+            return None
+        return TemplateResponse(request, 'admin/todo/confirm_delete.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Are you sure?',
+            'opts': opts,
+            # Loads the jQuery that admin/js/cancel.js needs.
+            'media': self.media,
+            'count': queryset.count(),
+            'action': request.POST['action'],
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+class VersionedAdminForm(forms.ModelForm):
+    """Refuses to save over changes made since the form was opened."""
+    # Named apart from the model field, which forms may not edit.
+    opened_version = forms.IntegerField(
+        widget=forms.HiddenInput, required=False,
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['opened_version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (self.instance.pk is not None and
+                cleaned_data.get('opened_version') != self.instance.version):
+            raise forms.ValidationError(
+                'This was changed since you opened it. Reload the page to '
+                'see the changes.'
+            )
+        return cleaned_data
+
+
+class VersionedAdmin(ScalableAdmin):
+    """Changes made here move the version on, see VersionedQuerySet.
+
+    Forms opened in the app before an admin change then report a conflict
+    instead of overwriting it, and so do admin forms opened before a change
+    made anywhere else.
+    """
+    form = VersionedAdminForm
+
+    def changeform_view(self, request, *args, **kwargs):
+        try:
+            return super().changeform_view(request, *args, **kwargs)
+        except VersionConflict:
+            self.message_user(
+                request, 'This was changed since you opened it. Here are '
+                'the changes.', messages.ERROR,
+            )
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        # Checked and written by one UPDATE, as a change may have committed
+        # since the form compared the versions.
+        updated = type(obj).objects.using(obj._state.db).filter(
+            pk=obj.pk,
+        ).update_version(form.cleaned_data['opened_version'], **{
+            field.name: field.pre_save(obj, False)
+            for field in obj._meta.concrete_fields
+            if field.name in form.cleaned_data or
+            getattr(field, 'auto_now', False)
+        })
+        if not updated:
+            raise VersionConflict(1)
+        obj.refresh_from_db(fields=['version'])
+
+
+def delete_lists(todo_lists):
+    """Delete lists along with their todos, without loading the todos."""
+    with transaction.atomic(using=todo_lists.db):
+        Todo.objects.using(todo_lists.db).filter(
+            todo_list__in=todo_lists,
+        ).delete()
+        _, deleted = todo_lists.delete()
+    return deleted.get(TodoList._meta.label, 0)
+
+
+@admin.register(TodoList)
+class TodoListAdmin(VersionedAdmin):
+    list_display = ('id', 'name', 'user', 'todo_count', 'todos')
+    list_select_related = ('user', 'stats')
+    autocomplete_fields = ('user',)
+    actions = ('delete_lists',)
+
+    def get_list_select_related(self, request):
+        # Users live on the default database, never on a shard.
+        if settings.TODO_SHARDS:
+            return ('stats',)
+        return self.list_select_related
+
+    def get_queryset(self, request):
+        todo_lists = super().get_queryset(request)
+        if settings.TODO_SHARDS:
+            return todo_lists.prefetch_related('user')
+        return todo_lists
+
+    def todo_count(self, todo_list):
+        return todo_list.stats.total
+
+    def todos(self, todo_list):
+        url = '%s?todo_list__id__exact=%d' % (
+            reverse('admin:todo_todo_changelist'), todo_list.pk,
+        )
+        if settings.TODO_SHARDS:
+            url += '&%s=%s' % (ShardFilter.parameter_name, todo_list._state.db)
+        return format_html('<a href="{}">View todos</a>', url)
+
+    def get_readonly_fields(self, request, obj=None):
+        # The stats and the shard of a list follow its owner.
+        if obj is not None:
+            return ('user',)
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            # New lists go to their owner's shard.
+            obj.save(using=db_for(obj.user))
+            return
+        super().save_model(request, obj, form, change)
+
+    def deleted_counts(self, objs):
+        using = objs[0]._state.db
+        pks = [todo_list.pk for todo_list in objs]
+        return [
+            (TodoList, len(objs)),
+            (Todo, Todo.objects.using(using).filter(
+                todo_list__in=pks,
+            ).count()),
+            (TodoListMember, TodoListMember.objects.using(using).filter(
+                todo_list__in=pks,
+            ).count()),
+            (Reminder, Reminder.objects.using(using).filter(
+                todo__todo_list__in=pks,
+            ).count()),
+        ]
+
+    def delete_model(self, request, obj):
+        delete_lists(TodoList.objects.using(obj._state.db).filter(pk=obj.pk))
+
+    def delete_lists(self, request, queryset):
+        """Delete lists along with their todos, without loading the todos."""
+        return self.confirm_delete(request, queryset, delete_lists)
+    delete_lists.short_description = 'Delete selected lists and their todos'
+
+
+@admin.register(Todo)
+class TodoAdmin(VersionedAdmin):
+    list_display = (
+        'id', 'description_preview', 'todo_list', 'is_complete', 'due_at',
+        'updated_at',
+    )
+    list_select_related = ('todo_list',)
+    # Only indexed columns are offered as filters. updated_at ranges are
+    # read from its index.
+    list_filter = ('updated_at',)
+    raw_id_fields = ('todo_list',)
+    actions = ('complete_todos', 'delete_todos')
+
+    def description_preview(self, todo):
+        if len(todo.description) > 80:
+            return todo.description[:80] + '…'
+        return todo.description
+    description_preview.short_description = 'description'
+
+    def save_model(self, request, obj, form, change):
+        """Keep the totals of the lists a changed todo leaves and joins."""
+        if not change:
+            # New todos go to their list's shard. count_created_todo
+            # counts them.
+            obj.save(using=obj.todo_list._state.db)
+            return
+        todos = Todo.objects.using(obj._state.db).filter(pk=obj.pk)
+        with transaction.atomic(using=todos.db):
+            TodoListStats.adjust(
+                todos.db, TodoListStats.count(todos), sign=-1,
+            )
+            super().save_model(request, obj, form, change)
+            TodoListStats.adjust(todos.db, TodoListStats.count(todos))
+
+    def deleted_counts(self, objs):
+        using = objs[0]._state.db
+        return [
+            (Todo, len(objs)),
+            (Reminder, Reminder.objects.using(using).filter(
+                todo__in=[todo.pk for todo in objs],
+            ).count()),
+        ]
+
+    def delete_model(self, request, obj):
+        # TodoQuerySet.delete() keeps the totals and deletes the reminders.
+        Todo.objects.using(obj._state.db).filter(pk=obj.pk).delete()
+
+    def complete_todos(self, request, queryset):
+        completed = queryset.complete()
+        self.message_user(
+            request, 'Completed %d todos.' % completed, messages.SUCCESS,
+        )
+    complete_todos.short_description = 'Complete selected todos'
+
+    def delete_todos(self, request, queryset):
+        def delete(todos):
+            return todos.delete()[1][Todo._meta.label]
+        return self.confirm_delete(request, queryset, delete)
+    delete_todos.short_description = 'Delete selected todos'
 
-# Register your models here.
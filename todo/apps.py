@@ -1,7 +1,65 @@
+import logging
+import os
+import time
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import Resolver404, get_resolver, resolve
+
+logger = logging.getLogger(__name__)
 
 
 class TodoConfig(AppConfig):
     name = 'todo'
 
+    def ready(self):
+        if getattr(settings, 'TODO_WARMUP', False):
+            self.warmup()
+
+    def warmup(self):
+        """Initialize the state Django otherwise builds on the first request.
+
+        Populates the URL resolver, compiles every template the app renders
+        and opens a connection to every database, shards included. Returns
+        the seconds spent on each phase.
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        resolver = get_resolver()
+        resolver.reverse_dict
+        try:
+            # Matching nothing forces every top level pattern to compile.
+            resolve('/__warmup__/')
+        except Resolver404:
+            pass
+        timings['urls'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        template_dir = os.path.join(self.path, 'templates')
+        names = sorted(
+            name for name in os.listdir(template_dir) if name.endswith('.html')
+        )
+        pack = getattr(settings, 'CRISPY_TEMPLATE_PACK', None)
+        if pack:
+            names += [
+                '%s/%s' % (pack, name)
+                for name in ('errors.html', 'field.html', 'uni_form.html')
+            ]
+        for name in names:
+            get_template(name)
+        timings['templates'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for alias in connections:
+            connections[alias].ensure_connection()
+        timings['database'] = time.perf_counter() - start
 
+        total = sum(timings.values())
+        logger.info('Warmup finished in %.1f ms: %s', total * 1000, ', '.join(
+            '%s %.1f ms' % (phase, seconds * 1000)
+            for phase, seconds in timings.items()
+        ))
+        return timings
@@ -0,0 +1,147 @@
+"""Helpers shared by the ``benchmark_*`` management commands.
+
+Benchmarks run against the configured database inside a transaction that
+is always rolled back, so seeded data never survives the run. Threaded
+ones need committed rows and delete what they seeded instead.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from statistics import mean
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from todo.models import TodoList, TodoListStats, Todo, VersionConflict
+
+
+@contextmanager
+def rollback():
+    """Run the block inside a transaction that is rolled back on exit."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def seed(username='benchmark', lists=1, todos=100, completed=0):
+    """Create a user owning ``lists`` lists of ``todos`` open todos each."""
+    user = get_user_model().objects.create_user(
+        username=username, password='benchmark',
+    )
+    TodoList.objects.bulk_create([
+        TodoList(name='List %d' % index, user=user) for index in range(lists)
+    ])
+    todo_lists = list(TodoList.objects.filter(user=user))
+    Todo.objects.bulk_create([
+        Todo(
+            todo_list=todo_list,
+            description='Todo %d' % index,
+            is_complete=index < completed,
+        )
+        for todo_list in todo_lists
+        for index in range(todos)
+    ], batch_size=500)
+    TodoListStats.objects.bulk_create([
+        TodoListStats(
+            todo_list=todo_list, user=user,
+            total=todos, completed=min(completed, todos),
+        )
+        for todo_list in todo_lists
+    ])
+    return user, todo_lists
+
+
+def request(user, path, method='get', **kwargs):
+    """Build a request for ``path`` that is authenticated as ``user``."""
+    request = getattr(RequestFactory(), method)(path, **kwargs)
+    request.user = user
+    request.session = SessionStore()
+    return request
+
+
+def measure(func, repeat=10):
+    """Call ``func`` ``repeat`` times and return (result, mean, best) seconds."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, mean(timings), min(timings)
+
+
+def append_concurrently(pks, method, threads=8, edits=50, think=0.001):
+    """Have threads append tokens to the descriptions of todos at once.
+
+    Every append reads a random todo of ``pks`` and writes it back with a
+    token added ``think`` seconds later. The ``method`` of writing is
+    ``'naive'``, overwriting whatever is there, ``'update'``, writing with
+    update_version() on the version read, or ``'check'``, locking the row
+    at that version with check_versions() first. Checked appends retry on a
+    conflict. Returns the tokens missing afterwards, the number of
+    conflicts and the seconds each write took.
+    """
+    conflicts = []
+    latencies = []
+    errors = []
+
+    def write(todos, pk, version, description):
+        if method == 'naive':
+            return todos.update_version(None, description=description)
+        if method == 'update':
+            return todos.update_version(version, description=description)
+        try:
+            with transaction.atomic():
+                todos.check_versions({pk: version})
+                return todos.update_version(None, description=description)
+        except VersionConflict:
+            return 0
+
+    def work(worker):
+        rng = random.Random(worker)
+        try:
+            for edit in range(edits):
+                token = '[%d.%d]' % (worker, edit)
+                pk = rng.choice(pks)
+                todos = Todo.objects.filter(pk=pk)
+                while True:
+                    description, version = todos.values_list(
+                        'description', 'version',
+                    ).get()
+                    time.sleep(think)
+                    start = time.perf_counter()
+                    updated = write(todos, pk, version, description + token)
+                    latencies.append(time.perf_counter() - start)
+                    if updated:
+                        break
+                    conflicts.append(token)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=work, args=(worker,))
+        for worker in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+
+    written = ''.join(Todo.objects.filter(pk__in=pks).values_list(
+        'description', flat=True,
+    ))
+    lost = [
+        token for token in (
+            '[%d.%d]' % (worker, edit)
+            for worker in range(threads) for edit in range(edits)
+        )
+        if token not in written
+    ]
+    return lost, len(conflicts), latencies
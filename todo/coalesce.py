@@ -0,0 +1,176 @@
+"""Share one render between concurrent identical GETs.
+
+Several tabs, auto-refreshing pages and retrying clients make one user
+request the same page many times at once. Decorating a view with
+``@coalesce`` lets the first of those requests render it while the others
+in the same process wait for its response, which is then reused for
+TODO_COALESCE_TTL seconds.
+
+Requests share a render when they come from the same user and session, for
+the same path and language, at the same data version. Every write request
+of a user moves their data version on, see DataVersionMiddleware, so a GET
+never reuses a page rendered before its user's last write.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+CSRF_INPUT = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def data_version(user):
+    """The version of a user's data, moved on by each of their writes.
+
+    Versions live in the TODO_COALESCE_CACHE cache. A missing version is
+    started at the current time in microseconds, so a version that was
+    evicted never comes back with a value a stored page was rendered at.
+    """
+    cache = caches[settings.TODO_COALESCE_CACHE]
+    key = 'todo:data-version:%s' % user.pk
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _start_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user):
+    cache = caches[settings.TODO_COALESCE_CACHE]
+    key = 'todo:data-version:%s' % user.pk
+    # incr moves the version on even when two writes share a clock tick.
+    if not cache.add(key, _start_version(), None):
+        cache.incr(key)
+
+
+def _start_version():
+    return int(time.time() * 1000000)
+
+
+class SharedResponse:
+    """The parts of a rendered response that any request may reuse.
+
+    Cookies are left out, the middleware of each request sets its own. The
+    CSRF token in forms is replaced with one for the reusing request.
+    """
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.content = response.content
+        self.headers = list(response.items())
+        match = CSRF_INPUT.search(self.content)
+        self.csrf_token = match.group(1) if match else None
+
+    def response_for(self, request):
+        content = self.content
+        if self.csrf_token is not None:
+            content = content.replace(
+                self.csrf_token, get_token(request).encode(),
+            )
+        response = HttpResponse(content, status=self.status_code)
+        for header, value in self.headers:
+            response[header] = value
+        return response
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """Run a function once for every key, however many threads ask at once.
+
+    Threads asking for a key while its function runs wait for the result,
+    which stays available for ``ttl`` seconds after it is ready.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        # Ordered by expiry, as results are kept for the same time.
+        self.results = OrderedDict()
+
+    def do(self, key, func, ttl):
+        """Return the result of ``func`` and whether it was shared.
+
+        Results of None are never shared. Waiting threads run ``func``
+        themselves when the running one fails or returns None.
+        """
+        now = time.monotonic()
+        with self.lock:
+            while self.results:
+                oldest = next(iter(self.results.values()))
+                if oldest[0] > now:
+                    break
+                self.results.popitem(last=False)
+            if key in self.results:
+                return self.results[key][1], True
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.result is not None:
+                return flight.result, True
+            return func(), False
+        try:
+            flight.result = func()
+            return flight.result, False
+        finally:
+            with self.lock:
+                del self.flights[key]
+                if flight.result is not None and ttl > 0:
+                    self.results[key] = (
+                        time.monotonic() + ttl, flight.result,
+                    )
+            flight.done.set()
+
+
+flight = SingleFlight()
+
+
+def coalesce(view):
+    """Share the responses of ``view`` between identical concurrent GETs.
+
+    Only 200 responses with their content rendered are shared. Everything
+    else, and every request that is not a GET by a logged in user, goes to
+    the view on its own.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.TODO_COALESCE or request.method != 'GET' or
+                not request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        key = (
+            request.user.pk, request.session.session_key,
+            request.get_full_path(), get_language(),
+            data_version(request.user),
+        )
+        response = None
+
+        def render():
+            nonlocal response
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return None
+            return SharedResponse(response)
+
+        shared, reused = flight.do(
+            key, render, settings.TODO_COALESCE_TTL,
+        )
+        if not reused:
+            # The leader, or a request whose response could not be shared,
+            # keeps the response its view returned.
+            return response
+        return shared.response_for(request)
+    return wrapper
@@ -1,8 +1,11 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.validators import MaxValueValidator
 from django.db.models import QuerySet
 
-from todo.models import TodoList, Todo
+from todo.models import TodoList, TodoListMember, Todo
+from todo.routers import db_for
 
 
 class SignupForm(forms.Form):
@@ -43,12 +46,97 @@ class TodoListForm(forms.ModelForm):
         fields = ['name']
 
 
+class TodoListDuplicateForm(forms.Form):
+    name = forms.CharField(required=False, max_length=255)
+    reset_complete = forms.BooleanField(required=False)
+
+
+class ShareListForm(forms.Form):
+    """Share a list with another user, or change what they may do."""
+    username = forms.CharField()
+    role = forms.ChoiceField(choices=TodoListMember.ROLES)
+
+    def __init__(self, todo_list: TodoList, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.todo_list = todo_list
+
+    def clean_username(self):
+        """Look up the user, who is returned instead of their username."""
+        user = get_user_model().objects.filter(
+            username=self.cleaned_data['username'],
+        ).first()
+        if user is None:
+            raise forms.ValidationError('No user has this username.')
+        if user.pk == self.todo_list.user_id:
+            raise forms.ValidationError('This user owns the list.')
+        if db_for(user) != self.todo_list._state.db:
+            raise forms.ValidationError(
+                "This user's lists are kept on another database, so the "
+                "list cannot be shared with them."
+            )
+        return user
+
+
 class TodoForm(forms.ModelForm):
+    # Browsers submit datetime-local inputs with a "T" between the date and
+    # the time, which Django does not parse by default.
+    due_at = forms.DateTimeField(
+        required=False,
+        input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M'],
+        widget=forms.DateTimeInput(
+            attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M',
+        ),
+    )
+    # The version of the todo the form was filled from. Saving fails with a
+    # conflict if the todo has been changed since.
+    version = forms.IntegerField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Todo
         exclude = ['todo_list', 'is_complete']
 
 
+class TodoBulkCreateForm(forms.Form):
+    """Creates a todo for every non-blank line of the descriptions."""
+    descriptions = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 6}),
+        label='Descriptions, one per line',
+    )
+
+    def clean_descriptions(self):
+        lines = [
+            line.strip()
+            for line in self.cleaned_data['descriptions'].splitlines()
+        ]
+        lines = [line for line in lines if line]
+        if len(lines) > settings.TODO_BATCH_MAX_OPERATIONS:
+            raise forms.ValidationError(
+                'At most %d todos can be created at once.' % (
+                    settings.TODO_BATCH_MAX_OPERATIONS
+                )
+            )
+        return lines
+
+
+def validate_descriptions(descriptions):
+    """Validate each description the way TodoForm does.
+
+    Returns the cleaned valid descriptions and a dict mapping the index of
+    every invalid description to its error messages.
+    """
+    valid, errors = [], {}
+    for index, description in enumerate(descriptions):
+        if not isinstance(description, str):
+            errors[index] = ['Description must be a string.']
+            continue
+        form = TodoForm({'description': description})
+        if form.is_valid():
+            valid.append(form.cleaned_data['description'])
+        else:
+            errors[index] = list(form.errors['description'])
+    return valid, errors
+
+
 class TodoBulkEditForm(forms.Form):
     action = forms.ChoiceField(
         choices=(('complete', 'complete'), ('delete', 'delete')),
@@ -58,3 +146,86 @@ class TodoBulkEditForm(forms.Form):
         super().__init__(*args, **kwargs)
         self.fields['todo_ids'] = forms.ModelMultipleChoiceField(queryset)
 
+    def clean(self):
+        """Collect the ``version_<id>`` the page showed for each todo.
+
+        ``versions`` maps the selected todos that came with one to it.
+        """
+        cleaned_data = super().clean()
+        versions = {}
+        for todo in cleaned_data.get('todo_ids', ()):
+            version = self.data.get('version_%d' % todo.pk)
+            if version is None:
+                continue
+            try:
+                versions[todo.pk] = int(version)
+            except ValueError:
+                raise forms.ValidationError('Versions must be numbers.')
+        cleaned_data['versions'] = versions
+        return cleaned_data
+
+
+BATCH_OPERATIONS = (
+    ('create_todo', 'create_todo'),
+    ('edit_todo', 'edit_todo'),
+    ('complete_todo', 'complete_todo'),
+    ('delete_todo', 'delete_todo'),
+    ('rename_list', 'rename_list'),
+)
+
+BATCH_REQUIRED_FIELDS = {
+    'create_todo': ('list_id', 'description'),
+    'edit_todo': ('todo_id', 'description'),
+    'complete_todo': ('todo_id',),
+    'delete_todo': ('todo_id',),
+    'rename_list': ('list_id', 'name'),
+}
+
+
+class BatchOperationForm(forms.Form):
+    """A single operation inside a batch mutation request."""
+    op = forms.ChoiceField(choices=BATCH_OPERATIONS)
+    list_id = forms.IntegerField(required=False)
+    todo_id = forms.IntegerField(required=False)
+    description = forms.CharField(required=False)
+    name = forms.CharField(required=False, max_length=255)
+    # The version of the todo, or of the list for rename_list, the client
+    # last read. The batch fails with a conflict if it has changed since.
+    version = forms.IntegerField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field in BATCH_REQUIRED_FIELDS.get(cleaned_data.get('op'), ()):
+            if cleaned_data.get(field) in (None, ''):
+                self.add_error(field, 'This field is required.')
+        return cleaned_data
+
+
+class OpenTodosForm(forms.Form):
+    """Filters and cursor of a page of open todos across lists.
+
+    ``list`` may be repeated to only show some lists. ``after`` is the
+    cursor of the previous page: the list and todo IDs of its last todo.
+    """
+    list = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    after = forms.RegexField(r'^\d+-\d+$', required=False)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['limit'].validators.append(
+            MaxValueValidator(settings.TODO_PAGE_SIZE),
+        )
+
+    def clean_list(self):
+        try:
+            return [int(list_id) for list_id in self.cleaned_data['list']]
+        except ValueError:
+            raise forms.ValidationError('Lists are given by their ID.')
+
+    def clean_after(self):
+        after = self.cleaned_data['after']
+        return tuple(int(part) for part in after.split('-')) if after else None
+
+    def clean_limit(self):
+        return self.cleaned_data['limit'] or settings.TODO_PAGE_SIZE
@@ -0,0 +1,157 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing, suppress
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+
+class Restarted(Exception):
+    """The copy started over more often than allowed."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Take a consistent snapshot of every SQLite database while the app '
+        'keeps running, using the online backup API. Pages are copied a '
+        'few at a time so writers only wait for one step. Needs Python 3.7 '
+        'or later.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Where snapshots are written.')
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to back up, may be repeated. Defaults to '
+                 'the default database and every shard in use.',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=256,
+            help='Pages copied per step, while the source is read locked.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.005,
+            help='Seconds between steps, leaving the database to writers.',
+        )
+        parser.add_argument(
+            '--max-restarts', type=int, default=5,
+            help='After the copy started over this many times because of '
+                 'concurrent writes, copy everything in one step.',
+        )
+        parser.add_argument(
+            '--compress', action='store_true',
+            help='Gzip the snapshots.',
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(sqlite3.Connection, 'backup'):
+            # The backup API came to the sqlite3 module in Python 3.7.
+            raise CommandError('Backups need Python 3.7 or later.')
+        aliases = options['databases'] or [
+            DEFAULT_DB_ALIAS, *settings.TODO_SHARDS,
+        ]
+        for alias in aliases:
+            if alias not in connections:
+                raise CommandError('Unknown database %s.' % alias)
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('%s is not an SQLite database.' % alias)
+        os.makedirs(options['directory'], exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        for alias in aliases:
+            path = os.path.join(
+                options['directory'], '%s-%s.sqlite3' % (alias, stamp),
+            )
+            self.backup(alias, path, options)
+
+    def backup(self, alias, path, options):
+        """Snapshot one database to ``path``, then check and compress it."""
+        connection = connections[alias]
+        if connection.in_atomic_block:
+            # Steps would wait for the connection's own write lock forever.
+            raise CommandError('Cannot back up %s inside a transaction.' % (
+                alias,
+            ))
+        connection.ensure_connection()
+        partial = path + '.partial'
+        compressed = path + '.gz.partial'
+        start = time.perf_counter()
+        try:
+            with closing(sqlite3.connect(partial)) as target:
+                try:
+                    steps = self.copy(
+                        connection.connection, target, options['pages'],
+                        options['sleep'], options['max_restarts'],
+                    )
+                except Restarted:
+                    # Writes keep landing between steps. A single step holds
+                    # the read lock until the copy is done, but finishes.
+                    self.stderr.write(self.style.WARNING(
+                        '%s: restarted %d times, copying in one step.' % (
+                            alias, options['max_restarts'] + 1,
+                        )
+                    ))
+                    steps = self.copy(connection.connection, target, -1)
+                copied = time.perf_counter() - start
+                result = target.execute(
+                    'PRAGMA integrity_check',
+                ).fetchone()[0]
+                if result != 'ok':
+                    raise CommandError(
+                        'Snapshot of %s failed its integrity check: %s' % (
+                            alias, result,
+                        )
+                    )
+            size = os.path.getsize(partial)
+            if options['compress']:
+                with open(partial, 'rb') as source, \
+                        gzip.open(compressed, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(partial)
+                path, partial = path + '.gz', compressed
+            # Only complete, checked snapshots ever carry the final name.
+            os.replace(partial, path)
+        except BaseException:
+            # Either file may be missing, which must not hide the error.
+            for leftover in (partial, compressed):
+                with suppress(FileNotFoundError):
+                    os.remove(leftover)
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            '%s: %.1f MiB in %d steps to %s, copied in %.2f s (%.1f MiB/s), '
+            '%.2f s in total.' % (
+                alias, size / 2 ** 20, steps, path, copied,
+                size / 2 ** 20 / copied if copied else 0, elapsed,
+            )
+        ))
+
+    def copy(self, source, target, pages, sleep=0, max_restarts=0):
+        """Copy ``source`` into ``target``, returning the number of steps.
+
+        A write from another connection between two steps makes SQLite
+        start over, so the copy always matches a single moment.
+        """
+        steps = restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal steps, restarts, last_remaining
+            steps += 1
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > max_restarts:
+                    raise Restarted
+            last_remaining = remaining
+            # Called between steps, while the source is not locked. The
+            # backup's own sleep only applies when a step finds it busy.
+            if remaining:
+                time.sleep(sleep)
+
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        return steps
@@ -0,0 +1,88 @@
+import threading
+import time
+from statistics import median
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from todo import benchmark, views
+from todo.coalesce import coalesce
+
+
+class Command(BaseCommand):
+    help = (
+        'Have threads GET the same list page at once, as tabs and retries '
+        'of one user do, with and without coalescing. Threads need '
+        'committed rows, so the seeded user is deleted after the run '
+        'instead of rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument(
+            '--rounds', type=int, default=20,
+            help='Times every thread requests the page.',
+        )
+        parser.add_argument('--todos', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user, (todo_list,) = benchmark.seed(
+            username='benchmark_coalesce', todos=options['todos'],
+        )
+        session = SessionStore()
+        session.create()
+        try:
+            self.stdout.write('%-12s %10s %10s %12s %12s' % (
+                'mode', 'renders', 'seconds', 'median ms', 'max ms',
+            ))
+            for mode, ttl in (('off', None), ('in flight', 0), ('ttl 1s', 1)):
+                self.run(mode, ttl, user, session, todo_list, options)
+        finally:
+            session.delete()
+            user.delete()
+
+    def run(self, mode, ttl, user, session, todo_list, options):
+        renders = []
+        # The view without login_required and coalesce around it.
+        view = views.view_list.__wrapped__.__wrapped__
+
+        def counted(request, **kwargs):
+            renders.append(1)
+            return view(request, **kwargs)
+        if ttl is not None:
+            counted = coalesce(counted)
+
+        path = '/lists/%d/' % todo_list.pk
+        barrier = threading.Barrier(options['threads'])
+        latencies = []
+
+        def work():
+            try:
+                for _ in range(options['rounds']):
+                    request = RequestFactory().get(path)
+                    request.user = user
+                    request.session = session
+                    barrier.wait()
+                    start = time.perf_counter()
+                    response = counted(request, list_id=todo_list.pk)
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work) for _ in range(options['threads'])
+        ]
+        start = time.perf_counter()
+        with override_settings(TODO_COALESCE_TTL=ttl or 0):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        seconds = time.perf_counter() - start
+        self.stdout.write('%-12s %10d %10.2f %12.1f %12.1f' % (
+            mode, len(renders), seconds, median(latencies) * 1000,
+            max(latencies) * 1000,
+        ))
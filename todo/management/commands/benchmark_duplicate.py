@@ -0,0 +1,57 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from todo import benchmark
+from todo.models import TodoList
+
+
+def naive_duplicate(todo_list):
+    """Copy a list by loading and saving every todo through the ORM."""
+    copy = TodoList.objects.create(
+        name='%s (copy)' % todo_list.name, user_id=todo_list.user_id,
+    )
+    for todo in todo_list.todo_set.order_by('id'):
+        todo.pk = None
+        todo.todo_list = copy
+        todo.save()
+    return copy
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare duplicating a list with INSERT ... SELECT against saving '
+        'every todo through the ORM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', type=int, default=100000)
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Report peak Python memory. Tracing slows down both runs.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-16s %12s %14s' % (
+            'method', 'seconds', 'peak MiB',
+        ))
+        with benchmark.rollback():
+            _, (todo_list,) = benchmark.seed(todos=options['todos'])
+            for method, duplicate in (
+                ('ORM loop', naive_duplicate),
+                ('INSERT SELECT', TodoList.duplicate),
+            ):
+                if options['memory']:
+                    tracemalloc.start()
+                copy, seconds, _ = benchmark.measure(
+                    lambda: duplicate(todo_list), repeat=1,
+                )
+                peak = '-'
+                if options['memory']:
+                    _, traced = tracemalloc.get_traced_memory()
+                    peak = '%.1f' % (traced / 2 ** 20)
+                    tracemalloc.stop()
+                assert copy.todo_set.count() == options['todos']
+                self.stdout.write('%-16s %12.2f %14s' % (
+                    method, seconds, peak,
+                ))
@@ -0,0 +1,51 @@
+from django.contrib.auth.forms import AuthenticationForm
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+
+from todo import benchmark
+from todo.forms import SignupForm, TodoBulkCreateForm, TodoForm, TodoListForm
+from todo.templatetags.todo_forms import render_form
+
+FORMS = (
+    ('login', AuthenticationForm),
+    ('signup', SignupForm),
+    ('signup, errors', lambda: SignupForm({
+        'username': 'user', 'email': 'invalid',
+        'password': 'password', 'password_repeated': 'other',
+    })),
+    ('create list', TodoListForm),
+    ('todo', TodoForm),
+    ('bulk create', TodoBulkCreateForm),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the time to render each form with crispy-forms templates '
+        'against the |bootstrap filter.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+
+    # DEBUG is switched off so crispy-forms templates go through the cached
+    # loader, as they would in production.
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        self.stdout.write('%-16s %14s %14s %10s' % (
+            'form', 'crispy ms', 'bootstrap ms', 'speedup',
+        ))
+        for name, form_class in FORMS:
+            # Rendering changes widget attributes, so every render gets a
+            # new form, as every request would.
+            _, crispy, _ = benchmark.measure(
+                lambda: as_crispy_form(form_class()), options['repeat'],
+            )
+            _, fast, _ = benchmark.measure(
+                lambda: render_form(form_class()), options['repeat'],
+            )
+            self.stdout.write('%-16s %14.3f %14.3f %9.1fx' % (
+                name, crispy * 1000, fast * 1000, crispy / fast,
+            ))
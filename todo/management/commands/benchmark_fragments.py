@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from todo import benchmark, views
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare bytes and render time of a full view_list page against '
+        'the rows and sidebar fragments used after a bulk action.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=10)
+        parser.add_argument('--todos', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    # Coalescing would serve every repeat after the first from its cache.
+    @override_settings(TODO_COALESCE=False)
+    def handle(self, *args, **options):
+        with benchmark.rollback():
+            user, todo_lists = benchmark.seed(
+                lists=options['lists'], todos=options['todos'],
+                completed=options['todos'] // 2,
+            )
+            list_id = todo_lists[0].id
+
+            def full_page():
+                return views.view_list(
+                    benchmark.request(user, '/lists/%d/' % list_id), list_id,
+                )
+
+            def fragments():
+                rows = views.list_rows(
+                    benchmark.request(user, '/lists/%d/rows/' % list_id),
+                    list_id,
+                )
+                sidebar = views.sidebar(
+                    benchmark.request(user, '/lists/sidebar/'),
+                )
+                return rows, sidebar
+
+            page, page_mean, page_best = benchmark.measure(
+                full_page, options['repeat'],
+            )
+            (rows, sidebar), frag_mean, frag_best = benchmark.measure(
+                fragments, options['repeat'],
+            )
+
+        page_bytes = len(page.content)
+        frag_bytes = len(rows.content) + len(sidebar.content)
+        self.stdout.write('%-24s %10s %12s %12s' % (
+            'response', 'bytes', 'mean ms', 'best ms',
+        ))
+        self.stdout.write('%-24s %10d %12.2f %12.2f' % (
+            'full view_list', page_bytes, page_mean * 1000, page_best * 1000,
+        ))
+        self.stdout.write('%-24s %10d %12.2f %12.2f' % (
+            'rows + sidebar', frag_bytes, frag_mean * 1000, frag_best * 1000,
+        ))
+        self.stdout.write('Saved %d bytes (%.0f%%) and %.2f ms per action.' % (
+            page_bytes - frag_bytes,
+            100.0 * (page_bytes - frag_bytes) / page_bytes,
+            (page_mean - frag_mean) * 1000,
+        ))
@@ -0,0 +1,74 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from todo import benchmark
+from todo.models import Todo
+from todo.views import todo_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rendering the rows of a large list from model instances, '
+        'from compact tuples and from tuples of description previews.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', type=int, default=20000)
+        parser.add_argument(
+            '--length', type=int, default=200,
+            help='Characters in each seeded description.',
+        )
+        parser.add_argument('--preview', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Report peak Python memory. Tracing slows down every run.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-12s %12s %12s %14s' % (
+            'rows', 'fetch ms', 'render ms', 'fetch MiB',
+        ))
+        with benchmark.rollback():
+            _, (todo_list,) = benchmark.seed(todos=options['todos'])
+            Todo.objects.filter(todo_list=todo_list).update(
+                description=Concat(
+                    'description', Value('.' * options['length']),
+                ),
+            )
+            todos = todo_list.todo_set.filter(is_complete=False)
+            for method, rows, preview in (
+                ('instances', lambda: todos.all(), None),
+                ('tuples', lambda: todo_rows(todos), None),
+                ('previews', lambda: todo_rows(todos), options['preview']),
+            ):
+                def render():
+                    return render_to_string('todo_rows.html', {
+                        'todo_list': todo_list,
+                        'todos': rows(),
+                        'completed_todos': [],
+                        'csrf_token': 'benchmark',
+                    })
+
+                with override_settings(TODO_DESCRIPTION_PREVIEW=preview):
+                    _, fetch, _ = benchmark.measure(
+                        lambda: list(rows()), repeat=options['repeat'],
+                    )
+                    _, mean, _ = benchmark.measure(
+                        render, repeat=options['repeat'],
+                    )
+                    peak = '-'
+                    if options['memory']:
+                        tracemalloc.start()
+                        list(rows())
+                        _, traced = tracemalloc.get_traced_memory()
+                        peak = '%.1f' % (traced / 2 ** 20)
+                        tracemalloc.stop()
+                self.stdout.write('%-12s %12.1f %12.1f %14s' % (
+                    method, fetch * 1000, mean * 1000, peak,
+                ))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from todo import benchmark, views
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second of anonymous login and signup pages '
+        'rendered on every request against cached page shells.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+
+    # DEBUG is switched off so templates go through the cached loader and the
+    # shell version is computed once, as they would be in production.
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        self.stdout.write('%-10s %-9s %12s %12s %12s' % (
+            'page', 'shells', 'mean ms', 'best ms', 'req/s',
+        ))
+        for name, view in (('login', views.login), ('signup', views.signup)):
+            means = {}
+            for shells in (False, True):
+                with override_settings(TODO_PAGE_SHELLS=shells):
+                    caches[settings.TODO_PAGE_SHELL_CACHE].clear()
+
+                    def get():
+                        return view(benchmark.request(
+                            AnonymousUser(), '/%s/' % name,
+                        ))
+
+                    # Fill the cache, then measure hits only.
+                    get()
+                    _, mean, best = benchmark.measure(get, options['repeat'])
+                means[shells] = mean
+                self.stdout.write('%-10s %-9s %12.3f %12.3f %12.0f' % (
+                    name, 'on' if shells else 'off', mean * 1000,
+                    best * 1000, 1 / mean,
+                ))
+            self.stdout.write('%s: %.1fx the throughput with shells.' % (
+                name, means[False] / means[True],
+            ))
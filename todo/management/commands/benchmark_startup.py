@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+from statistics import mean
+
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so every import and lazy initialization is
+# paid again, like a newly spawned worker. DEBUG is switched off so the
+# cached template loader is used, as it would be in production.
+COLD_START = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.apps import apps
+from django.conf import settings
+from django.test import Client
+settings.DEBUG = False
+settings.ALLOWED_HOSTS = ['localhost']
+timings = {'setup': time.perf_counter() - start, 'warmup': 0.0}
+if sys.argv[1] == 'warm':
+    start = time.perf_counter()
+    apps.get_app_config('todo').warmup()
+    timings['warmup'] = time.perf_counter() - start
+client = Client(HTTP_HOST='localhost')
+for phase in ('first', 'second'):
+    start = time.perf_counter()
+    assert client.get(sys.argv[2]).status_code == 200
+    timings[phase] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold-start time to the first response of a fresh worker, '
+        'with and without the TodoConfig warmup phase.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/login/')
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-6s %10s %10s %10s %10s %10s' % (
+            'mode', 'setup ms', 'warmup ms', 'first ms', 'second ms',
+            'total ms',
+        ))
+        for mode in ('cold', 'warm'):
+            runs = [self.run(mode, options['path'])
+                    for _ in range(options['runs'])]
+            phases = {
+                phase: mean(run[phase] for run in runs) * 1000
+                for phase in ('setup', 'warmup', 'first', 'second')
+            }
+            self.stdout.write('%-6s %10.1f %10.1f %10.1f %10.1f %10.1f' % (
+                mode, phases['setup'], phases['warmup'], phases['first'],
+                phases['second'],
+                phases['setup'] + phases['warmup'] + phases['first'],
+            ))
+
+    def run(self, mode, path):
+        process = subprocess.run(
+            [sys.executable, '-c', COLD_START, mode, path],
+            env=dict(os.environ), stdout=subprocess.PIPE,
+            universal_newlines=True, check=True,
+        )
+        return json.loads(process.stdout)
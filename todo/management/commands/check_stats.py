@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from todo.models import TodoListStats
+
+
+def describe(counts):
+    if counts is None:
+        return 'missing'
+    return '%d total, %d completed' % counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per-list todo totals from the todos on every database '
+        'and report the lists whose stored totals had drifted.'
+    )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for using in settings.TODO_SHARDS or [DEFAULT_DB_ALIAS]:
+            drift = TodoListStats.rebuild(using)
+            drifted += len(drift)
+            for list_id, stored, actual in drift:
+                self.stdout.write('%s: list %d stored %s, actual %s' % (
+                    using, list_id, describe(stored), describe(actual),
+                ))
+        if drifted:
+            self.stdout.write(self.style.WARNING(
+                'Rebuilt totals, %d lists had drifted.' % drifted,
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('All totals were correct.'))
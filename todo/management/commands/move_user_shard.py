@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from todo.models import (
+    Reminder, Todo, TodoList, TodoListMember, TodoListStats, UserShard,
+)
+from todo.routers import db_for, hashed_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a user's lists and todos to another shard. Lists and todos get "
+        "new IDs on the target, their reminders follow them. Lists can only "
+        "be shared within a shard, so the user's shares are dropped. The "
+        "user should not be making changes while this runs. Rerunning an "
+        "interrupted move finishes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('shard')
+
+    def handle(self, *args, **options):
+        if options['shard'] not in settings.TODO_SHARDS:
+            raise CommandError('Unknown shard %s.' % options['shard'])
+        user_model = get_user_model()
+        try:
+            user = user_model.objects.get(username=options['username'])
+        except user_model.DoesNotExist:
+            raise CommandError('Unknown user %s.' % options['username'])
+        source, target = db_for(user), options['shard']
+        if source == target:
+            self.stdout.write('%s is already on %s.' % (user, target))
+        else:
+            lists, todos, reminders = self.copy(user, source, target)
+            if target == hashed_shard(user.pk):
+                UserShard.objects.filter(user=user).delete()
+            else:
+                UserShard.objects.update_or_create(
+                    user=user, defaults={'shard': target},
+                )
+            self.stdout.write(
+                'Copied %d lists, %d todos and %d reminders from %s to '
+                '%s.' % (lists, todos, reminders, source, target)
+            )
+        # A run interrupted after the directory update leaves the user's
+        # rows behind on the source, where members of their lists would
+        # keep using them. Every run clears what is left on other shards.
+        for alias in settings.TODO_SHARDS:
+            if alias != target:
+                lists, shares = self.clear(user, alias)
+                if lists or shares:
+                    self.stdout.write(
+                        'Deleted %d lists and dropped %d shares on %s.' % (
+                            lists, shares, alias,
+                        )
+                    )
+
+    def copy(self, user, source, target):
+        """Copy the user's lists, todos and reminders from source to target.
+
+        Returns how many of each were copied.
+        """
+        with transaction.atomic(using=target):
+            # Leftovers of an interrupted move are invisible to the user
+            # until the directory points here, so start from scratch.
+            self.delete_lists(user, target)
+            todo_lists = list(TodoList.objects.using(source).filter(
+                user=user,
+            ).order_by('id'))
+            copies = [
+                TodoList(name=todo_list.name, user_id=user.pk)
+                for todo_list in todo_lists
+            ]
+            for copy in copies:
+                copy.save(using=target)
+            list_ids = {
+                todo_list.id: copy.id
+                for todo_list, copy in zip(todo_lists, copies)
+            }
+            todos = Todo.objects.using(source).filter(
+                todo_list__in=list_ids,
+            ).order_by('id')
+            todo_ids = []
+            batch = []
+            for todo in todos.iterator():
+                todo_ids.append(todo.pk)
+                todo.pk = None
+                todo.todo_list_id = list_ids[todo.todo_list_id]
+                batch.append(todo)
+                if len(batch) == 500:
+                    Todo.objects.using(target).bulk_create(batch)
+                    batch = []
+            Todo.objects.using(target).bulk_create(batch)
+            copied = Todo.objects.using(target).filter(
+                todo_list__in=list_ids.values(),
+            )
+            # Todos were copied in bulk, which the totals do not follow.
+            TodoListStats.adjust(target, TodoListStats.count(copied))
+            # bulk_create() does not return IDs on SQLite, but they are
+            # handed out in insertion order, which followed the old IDs.
+            new_ids = dict(zip(
+                todo_ids, copied.order_by('id').values_list('id', flat=True),
+            ))
+            # Reminders follow their todos, or every todo that already had
+            # one would fire again under its new ID.
+            reminders = [
+                Reminder(todo_id=new_ids[todo_id], due_at=due_at)
+                for todo_id, due_at in Reminder.objects.using(source).filter(
+                    todo__todo_list__in=list_ids,
+                ).values_list('todo', 'due_at').iterator()
+            ]
+            Reminder.objects.using(target).bulk_create(
+                reminders, batch_size=500,
+            )
+        return len(copies), len(todo_ids), len(reminders)
+
+    def clear(self, user, alias):
+        """Delete the user's lists and shares on ``alias``.
+
+        Returns how many lists were deleted and how many shares dropped.
+        """
+        # Members of the user's lists, and the user as a member of other
+        # lists. Lists can only be shared within a shard.
+        shares = TodoListMember.objects.using(alias).filter(
+            Q(todo_list__user=user) | Q(user=user),
+        )
+        with transaction.atomic(using=alias):
+            dropped = shares.count()
+            shares.delete()
+            deleted = self.delete_lists(user, alias)
+        return deleted, dropped
+
+    def delete_lists(self, user, alias):
+        """Delete the user's lists on ``alias``, returning how many."""
+        Todo.objects.using(alias).filter(todo_list__user=user).delete()
+        _, deleted = TodoList.objects.using(alias).filter(user=user).delete()
+        return deleted.get(TodoList._meta.label, 0)
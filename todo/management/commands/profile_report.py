@@ -0,0 +1,49 @@
+import glob
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregate the profiles written by ProfilerMiddleware and print the '
+        'hottest functions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.TODO_PROFILE_DIR)
+        parser.add_argument('--url-name', help='Only include this URL name.')
+        parser.add_argument('--user', help='Only include this user tag.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=('cumulative', 'tottime', 'ncalls'),
+        )
+
+    def handle(self, *args, **options):
+        files = []
+        for path in sorted(glob.glob(os.path.join(options['dir'], '*.prof'))):
+            # ProfilerMiddleware writes <time>-<pid>.<url name>.<user>.prof.
+            parts = os.path.basename(path).split('.')
+            if len(parts) != 4:
+                self.stderr.write(self.style.WARNING(
+                    'Skipping %s, which ProfilerMiddleware did not write.' % (
+                        path,
+                    )
+                ))
+                continue
+            _, url_name, user, _ = parts
+            if options['url_name'] not in (None, url_name):
+                continue
+            if options['user'] not in (None, user):
+                continue
+            files.append(path)
+        if not files:
+            raise CommandError('No matching profiles in %s.' % options['dir'])
+
+        self.stdout.write('Aggregated %d profiles.' % len(files))
+        stats = pstats.Stats(*files, stream=self.stdout)
+        stats.strip_dirs().sort_stats(options['sort'])
+        stats.print_stats(options['top'])
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.middleware import profile_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Print a signed header that makes ProfilerMiddleware profile a '
+        'request.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.TODO_PROFILE_HEADER:
+            raise CommandError('TODO_PROFILE_HEADER is not configured.')
+        self.stdout.write('%s: %s' % (
+            settings.TODO_PROFILE_HEADER, profile_token(),
+        ))
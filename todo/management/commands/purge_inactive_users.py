@@ -0,0 +1,169 @@
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from todo.models import Todo, TodoList, TodoListMember
+from todo.routers import db_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the lists and todos of users who have not logged in for '
+        'TODO_RETENTION_DAYS, in small batches that each commit on their '
+        'own. An interrupted run picks up where it stopped when run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TODO_RETENTION_DAYS,
+            help='Purge users who have not logged in for this many days.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Rows deleted per transaction.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Seconds to sleep between batches, so requests waiting '
+                 'for the database lock get their turn.',
+        )
+        parser.add_argument(
+            '--delete-users', action='store_true',
+            help='Delete the emptied accounts as well.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be deleted.',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.pause = options['pause']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        session_model = self.session_model()
+        users = get_user_model().objects.filter(
+            Q(last_login__lt=cutoff) |
+            Q(last_login__isnull=True, date_joined__lt=cutoff),
+            is_staff=False, is_superuser=False,
+        )
+        # IDs are read up front, as SQLite cursors should not stay open
+        # while their table is written to.
+        user_ids = list(users.order_by('pk').values_list('pk', flat=True))
+        # last_login is only set by logging in, so a user can stay active
+        # on one session for longer than the cutoff.
+        active = self.session_users(session_model, user_ids)
+        user_ids = [pk for pk in user_ids if pk not in active]
+
+        purged = lists = todos = 0
+        for user in self.in_batches(users, user_ids):
+            using = db_for(user)
+            totals = TodoList.objects.using(using).filter(
+                user_id=user.pk,
+            ).aggregate(lists=Count('id'), todos=Sum('stats__total'))
+            if not totals['lists'] and not options['delete_users']:
+                continue
+            purged += 1
+            lists += totals['lists']
+            todos += totals['todos'] or 0
+            if options['dry_run']:
+                self.stdout.write('Would purge %s: %d lists, %d todos.' % (
+                    user, totals['lists'], totals['todos'] or 0,
+                ))
+                continue
+            self.purge(user, using)
+            if options['delete_users']:
+                user.delete()
+            self.stdout.write('Purged %s: %d lists, %d todos.' % (
+                user, totals['lists'], totals['todos'] or 0,
+            ))
+
+        # Purged users hold no live sessions, so this removes theirs along
+        # with everyone else's expired ones.
+        sessions = 0
+        if session_model is not None and not options['dry_run']:
+            sessions = self.delete_in_batches(session_model.objects.filter(
+                expire_date__lt=timezone.now(),
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            '%s %d users: %d lists, %d todos and %d expired sessions.' % (
+                'Would purge' if options['dry_run'] else 'Purged',
+                purged, lists, todos, sessions,
+            )
+        ))
+
+    def in_batches(self, queryset, ids):
+        for start in range(0, len(ids), self.batch_size):
+            yield from queryset.filter(
+                pk__in=ids[start:start + self.batch_size],
+            ).order_by('pk')
+
+    def purge(self, user, using):
+        """Delete a user's todos, lists and memberships a batch at a time."""
+        todos = Todo.objects.using(using).filter(todo_list__user_id=user.pk)
+        while True:
+            ids = list(todos.values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                break
+            # Keeps the totals and deletes reminders without the collector.
+            Todo.objects.using(using).filter(pk__in=ids).delete()
+            time.sleep(self.pause)
+        # The lists are empty now, their cascade only reaches the totals.
+        self.delete_in_batches(
+            TodoList.objects.using(using).filter(user_id=user.pk),
+        )
+        self.delete_in_batches(
+            TodoListMember.objects.using(using).filter(user_id=user.pk),
+        )
+
+    def delete_in_batches(self, queryset):
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[
+                :self.batch_size
+            ])
+            if not ids:
+                return deleted
+            queryset.model.objects.using(queryset.db).filter(
+                pk__in=ids,
+            ).delete()
+            deleted += len(ids)
+            time.sleep(self.pause)
+
+    def session_model(self):
+        """The session model, or None when sessions are not in a table."""
+        engine = import_module(settings.SESSION_ENGINE)
+        get_model_class = getattr(engine.SessionStore, 'get_model_class', None)
+        return get_model_class() if get_model_class else None
+
+    def session_users(self, session_model, user_ids):
+        """IDs of the given users holding a session that has not expired.
+
+        Sessions are read a batch at a time in key order, each batch with a
+        query of its own, so no cursor stays open over the session table.
+        """
+        if session_model is None or not user_ids:
+            return set()
+        # Sessions store user IDs as strings.
+        candidates = {str(pk): pk for pk in user_ids}
+        users = set()
+        sessions = session_model.objects.filter(
+            expire_date__gte=timezone.now(),
+        ).order_by('session_key')
+        last_key = ''
+        while True:
+            batch = list(sessions.filter(session_key__gt=last_key)[
+                :self.batch_size
+            ])
+            if not batch:
+                return users
+            for session in batch:
+                user_id = session.get_decoded().get('_auth_user_id')
+                if user_id in candidates:
+                    users.add(candidates[user_id])
+            last_key = batch[-1].session_key
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from todo.reminders import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Create reminder records for open todos as they fall due. Keeps the '
+        'upcoming deadlines in memory and polls for changes every interval.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help='Seconds between polls.',
+        )
+        parser.add_argument(
+            '--horizon', type=float, default=60 * 60,
+            help='Seconds of upcoming deadlines to keep in memory.',
+        )
+        parser.add_argument(
+            '--catch-up', type=float, default=60 * 60,
+            help='Seconds of missed deadlines to fire on startup.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--once', action='store_true', help='Poll once and exit.',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            settings.TODO_SHARDS or [DEFAULT_DB_ALIAS],
+            horizon=timedelta(seconds=options['horizon']),
+            batch_size=options['batch_size'],
+            catch_up=timedelta(seconds=options['catch_up']),
+        )
+        try:
+            while True:
+                fired = scheduler.tick()
+                if fired or options['verbosity'] > 1:
+                    self.stdout.write('Fired %d reminders, %d scheduled.' % (
+                        fired, len(scheduler),
+                    ))
+                if options['once']:
+                    break
+                # Wake up for the next deadline rather than a poll late.
+                delay = options['interval']
+                next_due = scheduler.next_due()
+                if next_due is not None:
+                    delay = min(delay, max(
+                        0, (next_due - timezone.now()).total_seconds(),
+                    ))
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,27 @@
+import argparse
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a management command that accepts --database once for every '
+        'shard, e.g. "shard_command migrate".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('command_name')
+        parser.add_argument('args', nargs=argparse.REMAINDER)
+
+    def handle(self, *args, **options):
+        if not settings.TODO_SHARDS:
+            raise CommandError('No shards are configured.')
+        command_name = options['command_name']
+        for alias in settings.TODO_SHARDS:
+            self.stdout.write('Running %s on %s' % (command_name, alias))
+            call_command(
+                command_name, *args, '--database=%s' % alias,
+                stdout=self.stdout, stderr=self.stderr,
+            )
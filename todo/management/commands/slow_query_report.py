@@ -0,0 +1,49 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarize the slow query log by view and statement, slowest total '
+        'time first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.TODO_SLOW_QUERY_LOG)
+        parser.add_argument('--view', help='Only include this view name.')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        try:
+            with open(options['log']) as log:
+                for line in log:
+                    record = json.loads(line)
+                    if options['view'] not in (None, record['view']):
+                        continue
+                    groups[record['view'], record['sql']].append(record)
+        except FileNotFoundError:
+            raise CommandError('No slow query log at %s.' % options['log'])
+
+        ranked = sorted(groups.items(), key=lambda item: -sum(
+            record['duration_ms'] for record in item[1]
+        ))
+        for (view, sql), records in ranked[:options['top']]:
+            durations = [record['duration_ms'] for record in records]
+            slowest = max(records, key=lambda record: record['duration_ms'])
+            plan = slowest['plan'] or []
+            self.stdout.write(
+                '%s: %d calls, %.1f ms total, %.1f ms mean, %.1f ms max%s' % (
+                    view or 'unresolved', len(records), sum(durations),
+                    sum(durations) / len(durations), max(durations),
+                    ', full table scan' if any(
+                        step.startswith('SCAN ') for step in plan
+                    ) else '',
+                )
+            )
+            self.stdout.write('  %s' % sql)
+            for step in plan:
+                self.stdout.write('    %s' % step)
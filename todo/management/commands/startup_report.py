@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+SETUP = 'import django; django.setup()'
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the packages that cost the most import time while a fresh '
+        'interpreter runs django.setup(). Needs Python 3.7 or later.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument(
+            '--depth', type=int, default=3,
+            help='Number of dotted name components to group modules by.',
+        )
+
+    def handle(self, *args, **options):
+        if sys.version_info < (3, 7):
+            # Older interpreters ignore -X importtime and report nothing.
+            raise CommandError('-X importtime needs Python 3.7 or later.')
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SETUP],
+            env=dict(os.environ), stderr=subprocess.PIPE,
+            universal_newlines=True, check=True,
+        )
+        packages = defaultdict(int)
+        total = 0
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            own, _, module = line[len('import time:'):].split('|')
+            if not own.strip().isdigit():
+                continue
+            # Self time excludes nested imports, so groups sum to the total.
+            package = '.'.join(module.strip().split('.')[:options['depth']])
+            packages[package] += int(own)
+            total += int(own)
+
+        self.stdout.write('%-40s %10s %7s' % ('package', 'self ms', '%'))
+        ranked = sorted(packages.items(), key=lambda item: -item[1])
+        for package, micros in ranked[:options['top']]:
+            self.stdout.write('%-40s %10.1f %6.1f%%' % (
+                package, micros / 1000, 100.0 * micros / total,
+            ))
+        self.stdout.write('%-40s %10.1f' % ('total', total / 1000))
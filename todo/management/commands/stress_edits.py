@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Have threads append to the descriptions of a few todos at once, '
+        'each reading a todo and writing it back, then count the appends '
+        'that were lost. Checked writes only land on the version they read '
+        'and retry on a conflict, naive writes overwrite whatever is there. '
+        'ConcurrentEditsTestCase runs the same appends in the test suite. '
+        'Threads need committed rows, so the seeded user is deleted after '
+        'the run instead of rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--edits', type=int, default=50,
+            help='Appends made by every thread.',
+        )
+        parser.add_argument(
+            '--todos', type=int, default=4,
+            help='Todos shared by the threads. Fewer means more conflicts.',
+        )
+        parser.add_argument(
+            '--think', type=float, default=0.001,
+            help='Seconds between reading a todo and writing it back.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-8s %8s %8s %10s %10s %14s' % (
+            'method', 'appends', 'lost', 'conflicts', 'seconds',
+            'max write ms',
+        ))
+        for method in ('naive', 'update', 'check'):
+            user, (todo_list,) = benchmark.seed(
+                username='stress_edits', todos=options['todos'],
+            )
+            try:
+                pks = list(todo_list.todo_set.values_list('pk', flat=True))
+                start = time.perf_counter()
+                lost, conflicts, latencies = benchmark.append_concurrently(
+                    pks, method, options['threads'], options['edits'],
+                    options['think'],
+                )
+                seconds = time.perf_counter() - start
+            finally:
+                user.delete()
+            self.stdout.write('%-8s %8d %8d %10d %10.2f %14.2f' % (
+                method, options['threads'] * options['edits'], len(lost),
+                conflicts, seconds, max(latencies) * 1000,
+            ))
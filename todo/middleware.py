@@ -0,0 +1,252 @@
+import cProfile
+import json
+import logging
+import math
+import os
+import random
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+
+from todo.coalesce import bump_data_version
+
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+PROFILE_SALT = 'todo.middleware.ProfilerMiddleware'
+
+EXPLAINED_STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+slow_query_logger = logging.getLogger('todo.slow_queries')
+
+
+class DataVersionMiddleware:
+    """Move a user's data version on after each of their write requests.
+
+    Coalesced views only reuse pages rendered at the current version, so
+    the page a client is redirected to after a write is always rendered
+    after it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (settings.TODO_COALESCE and request.method in WRITE_METHODS and
+                request.user.is_authenticated):
+            bump_data_version(request.user)
+        return response
+
+
+class ThrottleMiddleware:
+    """Token bucket rate limiting of write requests, per user and per IP.
+
+    ``TODO_THROTTLE_RATES`` maps URL names to ``(capacity, period)``: a
+    bucket holds up to ``capacity`` tokens and refills completely over
+    ``period`` seconds. A write request needs a token from the bucket of its
+    client IP and, when logged in, of its user. Requests to URL names without
+    a rate, and reads, are never throttled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rates = settings.TODO_THROTTLE_RATES
+        self.cache = caches[settings.TODO_THROTTLE_CACHE]
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in WRITE_METHODS:
+            return None
+        url_name = request.resolver_match.url_name
+        rate = self.rates.get(url_name)
+        if rate is None:
+            return None
+        capacity, period = rate
+        refill = capacity / period
+        now = time.monotonic()
+
+        # REMOTE_ADDR is used instead of X-Forwarded-For, which clients can
+        # set to anything.
+        keys = ['throttle:%s:ip:%s' % (url_name, request.META['REMOTE_ADDR'])]
+        if request.user.is_authenticated:
+            keys.append('throttle:%s:user:%s' % (url_name, request.user.pk))
+        buckets = self.cache.get_many(keys)
+
+        tokens = {}
+        for key in keys:
+            available, updated = buckets.get(key, (capacity, now))
+            tokens[key] = min(capacity, available + (now - updated) * refill)
+        lowest = min(tokens.values())
+        if lowest < 1:
+            response = HttpResponse('Too many requests.', status=429)
+            response['Retry-After'] = str(math.ceil((1 - lowest) / refill))
+            return response
+
+        # Buckets that outlive their period are full again, so they expire.
+        self.cache.set_many({
+            key: (available - 1, now) for key, available in tokens.items()
+        }, timeout=math.ceil(period))
+        return None
+
+
+def profile_token():
+    """Value for the TODO_PROFILE_HEADER that forces a request profile."""
+    return signing.dumps('profile', salt=PROFILE_SALT)
+
+
+class ProfilerMiddleware:
+    """Profile a sample of requests with cProfile and dump them to disk.
+
+    A request is profiled with probability ``TODO_PROFILE_RATE`` or when its
+    ``TODO_PROFILE_HEADER`` carries a token from :func:`profile_token` that
+    is younger than ``TODO_PROFILE_TOKEN_MAX_AGE`` seconds. Profiles are
+    written to ``TODO_PROFILE_DIR`` as ``<time>-<pid>.<url name>.<user>.prof``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = settings.TODO_PROFILE_RATE
+        self.header = settings.TODO_PROFILE_HEADER
+        if not self.rate and not self.header:
+            raise MiddlewareNotUsed
+        self.directory = settings.TODO_PROFILE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this interpreter.
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        self.dump(request, profiler)
+        return response
+
+    def should_profile(self, request):
+        if self.rate and random.random() < self.rate:
+            return True
+        if not self.header:
+            return False
+        token = request.META.get(
+            'HTTP_' + self.header.upper().replace('-', '_'),
+        )
+        if not token:
+            return False
+        try:
+            signing.loads(
+                token, salt=PROFILE_SALT,
+                max_age=settings.TODO_PROFILE_TOKEN_MAX_AGE,
+            )
+        except signing.BadSignature:
+            return False
+        return True
+
+    def dump(self, request, profiler):
+        match = getattr(request, 'resolver_match', None)
+        url_name = 'unresolved'
+        if match and match.url_name:
+            url_name = match.view_name
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            user = 'user-%s' % user.pk
+        else:
+            user = 'anonymous'
+        filename = '%s-%d.%s.%s.prof' % (
+            datetime.now().strftime('%Y%m%dT%H%M%S%f'), os.getpid(),
+            url_name.replace(':', '-'), user,
+        )
+        profiler.dump_stats(os.path.join(self.directory, filename))
+
+
+class SlowQueryLogger:
+    """Execute wrapper that logs statements slower than a threshold.
+
+    Each slow statement is logged to ``todo.slow_queries`` as a JSON object
+    with the view that issued it, its duration, its parameters (unless
+    ``TODO_SLOW_QUERY_REDACT`` is on) and the database's query plan.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.threshold = settings.TODO_SLOW_QUERY_MS / 1000
+        self.redact = settings.TODO_SLOW_QUERY_REDACT
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.monotonic() - start
+            if duration >= self.threshold:
+                self.log(sql, params, many, context['connection'], duration)
+
+    def log(self, sql, params, many, connection, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        record = {
+            'time': timezone.now().isoformat(),
+            'view': match.view_name if match else None,
+            'path': self.request.path,
+            'database': connection.alias,
+            'duration_ms': round(duration * 1000, 3),
+            'sql': sql,
+            'params': None if self.redact or many else [
+                str(param) for param in params or ()
+            ],
+            'plan': None if many else self.explain(sql, params, connection),
+        }
+        slow_query_logger.warning(json.dumps(record))
+
+    def explain(self, sql, params, connection):
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            return None
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else (
+            'EXPLAIN '
+        )
+        self.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                if connection.vendor == 'sqlite':
+                    # Rows are (id, parent, notused, detail).
+                    return [row[-1] for row in cursor.fetchall()]
+                return [
+                    ' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                ]
+        except Exception as error:
+            return ['EXPLAIN failed: %s' % error]
+        finally:
+            self.explaining = False
+
+
+class SlowQueryMiddleware:
+    """Install :class:`SlowQueryLogger` on every connection for a request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrapper = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
@@ -0,0 +1,47 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+
+def count_todos(apps, schema_editor):
+    using = schema_editor.connection.alias
+    TodoList = apps.get_model('todo', 'TodoList')
+    TodoListStats = apps.get_model('todo', 'TodoListStats')
+    todo_lists = TodoList.objects.using(using).annotate(
+        total=Count('todo'),
+        completed=Count('todo', filter=Q(todo__is_complete=True)),
+    )
+    TodoListStats.objects.using(using).bulk_create([
+        TodoListStats(
+            todo_list_id=todo_list.pk, user_id=todo_list.user_id,
+            total=todo_list.total, completed=todo_list.completed,
+        )
+        for todo_list in todo_lists.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('todo', '0002_sharding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoListStats',
+            fields=[
+                ('todo_list', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='todo.TodoList')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(
+            count_todos, migrations.RunPython.noop,
+            hints={'model_name': 'todoliststats'},
+        ),
+    ]
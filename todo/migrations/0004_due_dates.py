@@ -0,0 +1,49 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0003_list_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('due_at__isnull', False), ('is_complete', False)), fields=['todo_list', 'due_at'], name='todo_open_due_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('due_at__isnull', False), ('is_complete', False)), fields=['due_at'], name='todo_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='todo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='todo.Todo'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(fields=('todo', 'due_at'), name='todo_reminder_unique'),
+        ),
+    ]
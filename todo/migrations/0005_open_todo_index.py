@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0004_due_dates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(is_complete=False), fields=['todo_list', 'id'], name='todo_open_list_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0005_open_todo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
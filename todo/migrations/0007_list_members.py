@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-19 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('todo', '0006_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoListMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('read', 'Can view'), ('write', 'Can edit')], default='read', max_length=5)),
+                ('todo_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='todo.TodoList')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todolistmember',
+            index=models.Index(fields=['user', 'todo_list'], name='todo_member_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='todolistmember',
+            constraint=models.UniqueConstraint(fields=('todo_list', 'user'), name='todo_member_unique'),
+        ),
+    ]
@@ -1,20 +1,206 @@
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from todo.routers import db_for
+
+
+class VersionConflict(Exception):
+    """Rows changed since the version a write was based on was read."""
+
+    def __init__(self, stale):
+        super().__init__('%d rows changed since they were read.' % stale)
+        self.stale = stale
+
+
+class VersionedQuerySet(models.QuerySet):
+    """Optimistic concurrency for models with a ``version`` column.
+
+    Every write increments the version. Writes based on an earlier read
+    check the version they read with a conditional UPDATE instead of
+    locking rows, so a write from another tab or client in between is
+    reported rather than silently overwritten.
+    """
+
+    def check_versions(self, versions):
+        """Make sure rows are still at the versions the caller read.
+
+        ``versions`` maps primary keys to versions. The rows are matched
+        with an UPDATE that changes nothing, which takes SQLite's write
+        lock, so the rows cannot change again until the transaction ends.
+        Raises VersionConflict, rolling back the enclosing atomic block,
+        when any row has moved on or is gone.
+        """
+        matched = 0
+        versions = list(versions.items())
+        # Two parameters per row, staying below SQLite's limit of 999.
+        for start in range(0, len(versions), 400):
+            matched += self.filter(reduce(or_, (
+                Q(pk=pk, version=version)
+                for pk, version in versions[start:start + 400]
+            ))).update(version=F('version'))
+        if matched != len(versions):
+            raise VersionConflict(len(versions) - matched)
+
+    def update_version(self, version, **fields):
+        """Update rows still at ``version``, returning how many were.
+
+        With a version of None the rows are updated whatever their version.
+        """
+        rows = self if version is None else self.filter(version=version)
+        return rows.update(version=F('version') + 1, **fields)
 
 
 class TodoList(models.Model):
     name = models.CharField(max_length=255, default='')
-    user = models.ForeignKey(get_user_model(), models.CASCADE)
+    # Users live on the default database while lists may live on a shard,
+    # so the database cannot enforce this key.
+    user = models.ForeignKey(
+        get_user_model(), models.CASCADE, db_constraint=False,
+    )
+    # Incremented by every write, see VersionedQuerySet.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = VersionedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def duplicate(self, name=None, reset_complete=False, user=None):
+        """Copy the list and its todos, returning the new list.
+
+        The copy belongs to ``user``, or to the owner of the list. The todos
+        are copied inside the database with a single INSERT ... SELECT, so
+        none of them are loaded into Python.
+        """
+        using = self._state.db
+        connection = connections[using]
+        with transaction.atomic(using=using):
+            copy = TodoList.objects.using(using).create(
+                name=name or '%s (copy)' % self.name,
+                user_id=self.user_id if user is None else user.pk,
+            )
+            # Fresh timestamps let the reminder scheduler find the copies.
+            overrides = {
+                'todo_list': copy.pk, 'updated_at': timezone.now(),
+                'version': 1,
+            }
+            if reset_complete:
+                overrides['is_complete'] = False
+            qn = connection.ops.quote_name
+            fields = [
+                field for field in Todo._meta.concrete_fields
+                if not field.primary_key
+            ]
+            selected, params = [], []
+            for field in fields:
+                if field.name in overrides:
+                    selected.append('%s')
+                    params.append(field.get_db_prep_value(
+                        overrides[field.name], connection,
+                    ))
+                else:
+                    selected.append(qn(field.column))
+            params.append(self.pk)
+            sql = (
+                'INSERT INTO {table} ({columns}) SELECT {selected} '
+                'FROM {table} WHERE {todo_list} = %s ORDER BY {pk}'
+            ).format(
+                table=qn(Todo._meta.db_table),
+                columns=', '.join(qn(field.column) for field in fields),
+                selected=', '.join(selected),
+                todo_list=qn(Todo._meta.get_field('todo_list').column),
+                pk=qn(Todo._meta.pk.column),
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            stats = TodoListStats.objects.using(using)
+            source = stats.get(todo_list_id=self.pk)
+            stats.filter(todo_list_id=copy.pk).update(
+                total=source.total,
+                completed=0 if reset_complete else source.completed,
+            )
+        return copy
+
+
+class TodoQuerySet(VersionedQuerySet):
+    """Bulk writes that keep the lists' TodoListStats in step."""
+
+    def complete(self):
+        """Complete the open todos, returning how many there were."""
+        todos = self.filter(is_complete=False)
+        with transaction.atomic(using=self.db, savepoint=False):
+            TodoListStats.adjust(self.db, {
+                list_id: (0, total)
+                for list_id, (total, _) in TodoListStats.count(todos).items()
+            })
+            return todos.update(
+                is_complete=True, version=F('version') + 1,
+            )
+
+    def delete(self):
+        """Delete the todos and their reminders without loading them.
+
+        Django's collector would fetch every todo to cascade the delete to
+        their reminders, one batch of IDs at a time.
+        """
+        assert not self.query.is_sliced, \
+            "Cannot use 'limit' or 'offset' with delete."
+        with transaction.atomic(using=self.db, savepoint=False):
+            TodoListStats.adjust(
+                self.db, TodoListStats.count(self), sign=-1,
+            )
+            reminders, _ = Reminder.objects.using(self.db).filter(
+                todo__in=self,
+            ).delete()
+            todos = self._raw_delete(self.db)
+        return reminders + todos, {
+            Reminder._meta.label: reminders, Todo._meta.label: todos,
+        }
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Todo(models.Model):
     todo_list = models.ForeignKey(TodoList, models.CASCADE)
     description = models.TextField(default='')
     is_complete = models.BooleanField(default=False)
+    due_at = models.DateTimeField(null=True, blank=True)
+    # Lets the reminder scheduler pick up changed due dates without scanning
+    # every todo. Queryset updates of due_at have to set it themselves.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Incremented by every write, see VersionedQuerySet.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = TodoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Only open todos with a due date are indexed, which keeps the
+            # indexes small. A due_at range implies due_at IS NOT NULL, so
+            # SQLite uses them for range queries on open todos.
+            models.Index(
+                fields=['todo_list', 'due_at'], name='todo_open_due_list_idx',
+                condition=Q(is_complete=False, due_at__isnull=False),
+            ),
+            models.Index(
+                fields=['due_at'], name='todo_open_due_idx',
+                condition=Q(is_complete=False, due_at__isnull=False),
+            ),
+            # Pages of open todos across lists are read in this order.
+            models.Index(
+                fields=['todo_list', 'id'], name='todo_open_list_idx',
+                condition=Q(is_complete=False),
+            ),
+        ]
 
     def __str__(self):
         return self.description
@@ -24,3 +210,197 @@ class Todo(models.Model):
             return True
         else:
             return False
+
+
+class TodoListStats(models.Model):
+    """Running totals of a list's todos.
+
+    Every write to todos adjusts these in the same transaction, so showing
+    counts never has to scan the todo table. ``manage.py check_stats``
+    rebuilds them from the todos and reports any drift.
+    """
+    todo_list = models.OneToOneField(
+        TodoList, models.CASCADE, primary_key=True, related_name='stats',
+    )
+    # Copied from the list so a user's totals are read from this table
+    # alone. Like TodoList.user it may point to another database.
+    user = models.ForeignKey(
+        get_user_model(), models.CASCADE, db_constraint=False,
+        related_name='+',
+    )
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '%s: %d/%d' % (self.todo_list_id, self.completed, self.total)
+
+    @property
+    def open(self):
+        return self.total - self.completed
+
+    @property
+    def completion_rate(self):
+        return self.completed / self.total if self.total else 0.0
+
+    @staticmethod
+    def count(todos):
+        """Map list IDs to (total, completed) for a queryset of todos."""
+        rows = todos.order_by().values('todo_list').annotate(
+            total=Count('pk'),
+            completed=Count('pk', filter=Q(is_complete=True)),
+        )
+        return {
+            row['todo_list']: (row['total'], row['completed'])
+            for row in rows
+        }
+
+    @classmethod
+    def adjust(cls, using, changes, sign=1):
+        """Add (total, completed) changes, by list ID, to the totals."""
+        for list_id, (total, completed) in changes.items():
+            changed = {}
+            if total:
+                changed['total'] = F('total') + sign * total
+            if completed:
+                changed['completed'] = F('completed') + sign * completed
+            if not changed:
+                continue
+            cls.objects.using(using).filter(todo_list_id=list_id).update(
+                **changed,
+            )
+
+    @classmethod
+    def rebuild(cls, using):
+        """Recount every list on a database, returning the drift found.
+
+        Drift is a list of (list ID, stored, actual) where stored and
+        actual are (total, completed) pairs, or None when the row or list
+        is missing.
+        """
+        with transaction.atomic(using=using):
+            stored = {
+                stats.todo_list_id: (stats.total, stats.completed)
+                for stats in cls.objects.using(using)
+            }
+            todo_lists = TodoList.objects.using(using).annotate(
+                total=Count('todo'),
+                completed=Count('todo', filter=Q(todo__is_complete=True)),
+            ).order_by('pk')
+            actual = {}
+            rebuilt = []
+            for todo_list in todo_lists.iterator():
+                actual[todo_list.pk] = (todo_list.total, todo_list.completed)
+                rebuilt.append(cls(
+                    todo_list_id=todo_list.pk, user_id=todo_list.user_id,
+                    total=todo_list.total, completed=todo_list.completed,
+                ))
+            cls.objects.using(using).all().delete()
+            cls.objects.using(using).bulk_create(rebuilt, batch_size=500)
+        return [
+            (list_id, stored.get(list_id), actual.get(list_id))
+            for list_id in sorted(set(stored) | set(actual))
+            if stored.get(list_id) != actual.get(list_id)
+        ]
+
+
+class TodoListMember(models.Model):
+    """A user a list is shared with, and what they may do with it.
+
+    Owners are never members, their lists are theirs to do anything with.
+    Members live on the list's database, so lists can only be shared with
+    users on the same shard.
+    """
+    READ = 'read'
+    WRITE = 'write'
+    ROLES = ((READ, 'Can view'), (WRITE, 'Can edit'))
+
+    todo_list = models.ForeignKey(
+        TodoList, models.CASCADE, related_name='members',
+    )
+    # Like TodoList.user it may point to another database.
+    user = models.ForeignKey(
+        get_user_model(), models.CASCADE, db_constraint=False,
+        related_name='+',
+    )
+    role = models.CharField(max_length=5, choices=ROLES, default=READ)
+
+    class Meta:
+        constraints = [
+            # Also the index the sidebar joins a user's role through.
+            models.UniqueConstraint(
+                fields=['todo_list', 'user'], name='todo_member_unique',
+            ),
+        ]
+        indexes = [
+            # The lists shared with a user are looked up from here.
+            models.Index(
+                fields=['user', 'todo_list'], name='todo_member_user_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return '%s: %s %s' % (self.todo_list_id, self.user_id, self.role)
+
+
+class Reminder(models.Model):
+    """A reminder fired by ``manage.py schedule_reminders`` for a due todo.
+
+    The due date is part of the key, so moving a todo's due date earns it a
+    new reminder while restarting the scheduler never repeats one.
+    """
+    todo = models.ForeignKey(Todo, models.CASCADE)
+    due_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['todo', 'due_at'], name='todo_reminder_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return '%s: %s' % (self.todo_id, self.due_at)
+
+
+class UserShard(models.Model):
+    """Directory of users moved off the shard their ID hashes to."""
+    user = models.OneToOneField(
+        get_user_model(), models.CASCADE, primary_key=True,
+    )
+    shard = models.CharField(max_length=64)
+
+    def __str__(self):
+        return '%s: %s' % (self.user_id, self.shard)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_sharded_lists(sender, instance, using, **kwargs):
+    """Delete what a user has on their shard, where cascades can't reach."""
+    shard = db_for(instance)
+    if shard != using:
+        TodoList.objects.using(shard).filter(user_id=instance.pk).delete()
+        TodoListMember.objects.using(shard).filter(
+            user_id=instance.pk,
+        ).delete()
+
+
+@receiver(post_save, sender=TodoList)
+def create_list_stats(sender, instance, created, using, raw, **kwargs):
+    """Start the totals of new lists at zero."""
+    if created and not raw:
+        TodoListStats.objects.using(using).create(
+            todo_list=instance, user_id=instance.user_id,
+        )
+
+
+@receiver(post_save, sender=Todo)
+def count_created_todo(sender, instance, created, using, raw, **kwargs):
+    """Count todos saved one at a time.
+
+    Bulk writes send no signals, so they adjust the totals themselves.
+    """
+    if created and not raw:
+        TodoListStats.adjust(using, {
+            instance.todo_list_id: (1, int(instance.is_complete)),
+        })
@@ -0,0 +1,82 @@
+"""Who may do what with a list.
+
+Owners may do anything with their lists. Other users reach a list through
+a TodoListMember row and may do what its role allows. Views resolve all of
+it with one query per request, see ``list_access()``.
+"""
+from django.core.exceptions import PermissionDenied
+from django.db.models import (
+    Case, CharField, F, FilteredRelation, Q, Value, When,
+)
+from django.http import Http404
+
+from todo.models import TodoList, TodoListMember
+from todo.routers import db_for
+
+READ = TodoListMember.READ
+WRITE = TodoListMember.WRITE
+OWNER = 'owner'
+# Every role allows what the ones before it do.
+ROLES = (READ, WRITE, OWNER)
+
+
+def list_access(request):
+    """Map the IDs of every list the user may open to the list.
+
+    The user's own lists and those shared with them are read with one
+    query, annotated with the user's ``role`` and the ``todo_count`` the
+    sidebar shows. The result is memoized on the request, so every check
+    after the first one is a dictionary lookup.
+    """
+    lists = getattr(request, '_todo_lists', None)
+    if lists is not None:
+        return lists
+    user = request.user
+    using = db_for(user)
+    shared = TodoListMember.objects.using(using).filter(
+        user=user,
+    ).values('todo_list')
+    # Each side of the OR is read from an index: user_id for owned lists,
+    # todo_member_user_idx for shared ones. The role is joined through the
+    # unique (list, user) index.
+    todo_lists = TodoList.objects.using(using).annotate(
+        membership=FilteredRelation(
+            'members', condition=Q(members__user=user),
+        ),
+        role=Case(
+            When(user=user, then=Value(OWNER)),
+            default=F('membership__role'), output_field=CharField(),
+        ),
+        todo_count=F('stats__total'),
+    ).filter(Q(user=user) | Q(pk__in=shared)).order_by('pk')
+    lists = request._todo_lists = {
+        todo_list.pk: todo_list for todo_list in todo_lists
+    }
+    return lists
+
+
+def allows(todo_list, role):
+    """Whether the annotated role on ``todo_list`` includes ``role``."""
+    return ROLES.index(todo_list.role) >= ROLES.index(role)
+
+
+def get_list(request, list_id, role=READ):
+    """The list ``list_id`` when the user's role on it includes ``role``.
+
+    Lists the user may not open raise Http404, as if they did not exist.
+    Lists they may open but not change raise PermissionDenied.
+    """
+    todo_list = list_access(request).get(list_id)
+    if todo_list is None:
+        raise Http404
+    if not allows(todo_list, role):
+        raise PermissionDenied
+    return todo_list
+
+
+def list_ids(request, role=READ):
+    """IDs of the lists on which the user's role includes ``role``."""
+    return [
+        pk for pk, todo_list in list_access(request).items()
+        if allows(todo_list, role)
+    ]
@@ -0,0 +1,122 @@
+import heapq
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from todo.models import Reminder, Todo
+
+# Todos saved in a transaction that commits after a poll may carry an
+# updated_at from before it, so each poll looks back this far as well.
+CHANGE_OVERLAP = timedelta(seconds=5)
+
+
+class ReminderScheduler:
+    """Fire reminders for open todos as they fall due.
+
+    Deadlines within ``horizon`` of now are kept in a heap. Every ``tick()``
+    extends the loaded window with the due_at index, picks up todos saved
+    since the last tick with the updated_at index and fires what has fallen
+    due. Nothing scans the whole todo table after the first load.
+
+    Heap entries are never removed in place. A todo whose due date moves is
+    pushed again and ``scheduled`` records the due date that counts, so
+    stale entries are skipped when they reach the top.
+    """
+
+    def __init__(self, databases, horizon, batch_size=500,
+                 catch_up=timedelta(hours=1)):
+        self.databases = databases
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.catch_up = catch_up
+        self.heap = []
+        self.scheduled = {}
+        self.loaded_until = None
+        self.changed_since = {}
+
+    def __len__(self):
+        return len(self.scheduled)
+
+    def schedule(self, using, pk, due_at):
+        key = (using, pk)
+        if self.scheduled.get(key) == due_at:
+            return
+        self.scheduled[key] = due_at
+        heapq.heappush(self.heap, (due_at, using, pk))
+
+    def load(self, now):
+        """Load deadlines up to the horizon and todos changed since."""
+        until = now + self.horizon
+        for using in self.databases:
+            todos = Todo.objects.using(using).filter(is_complete=False)
+            if self.loaded_until is None:
+                window = todos.filter(
+                    due_at__gte=now - self.catch_up, due_at__lte=until,
+                )
+            else:
+                window = todos.filter(
+                    due_at__gt=self.loaded_until, due_at__lte=until,
+                )
+            for pk, due_at in window.values_list('pk', 'due_at').iterator():
+                self.schedule(using, pk, due_at)
+
+            since = self.changed_since.get(using)
+            self.changed_since[using] = now
+            if since is None:
+                continue
+            changed = Todo.objects.using(using).filter(
+                updated_at__gte=since - CHANGE_OVERLAP,
+            ).values_list('pk', 'due_at', 'is_complete')
+            for pk, due_at, is_complete in changed.iterator():
+                if is_complete or due_at is None or due_at > until:
+                    self.scheduled.pop((using, pk), None)
+                else:
+                    self.schedule(using, pk, due_at)
+        self.loaded_until = until
+
+    def pop_due(self, now):
+        """Take the todos due by now off the heap, by database."""
+        due = {}
+        while self.heap and self.heap[0][0] <= now:
+            due_at, using, pk = heapq.heappop(self.heap)
+            if self.scheduled.get((using, pk)) != due_at:
+                continue
+            del self.scheduled[(using, pk)]
+            due.setdefault(using, {})[pk] = due_at
+        return due
+
+    def fire(self, now):
+        """Create reminders for the todos due by now, in batches.
+
+        Returns the number of reminders fired. Reminders that already exist
+        are left alone.
+        """
+        fired = 0
+        for using, todos in self.pop_due(now).items():
+            pks = list(todos)
+            for start in range(0, len(pks), self.batch_size):
+                batch = pks[start:start + self.batch_size]
+                # Skip todos completed or moved since they were loaded.
+                current = Todo.objects.using(using).filter(
+                    pk__in=batch, is_complete=False,
+                ).values_list('pk', 'due_at')
+                reminders = [
+                    Reminder(todo_id=pk, due_at=due_at)
+                    for pk, due_at in current if todos[pk] == due_at
+                ]
+                with transaction.atomic(using=using):
+                    Reminder.objects.using(using).bulk_create(
+                        reminders, ignore_conflicts=True,
+                    )
+                fired += len(reminders)
+        return fired
+
+    def next_due(self):
+        """The earliest deadline in the heap, possibly a stale one."""
+        return self.heap[0][0] if self.heap else None
+
+    def tick(self, now=None):
+        now = now or timezone.now()
+        self.load(now)
+        return self.fire(now)
@@ -0,0 +1,82 @@
+import zlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+
+# Models whose rows live on their owner's shard. Everything else, including
+# auth and sessions, stays on the default database.
+SHARDED_MODELS = frozenset((
+    'todolist', 'todo', 'todoliststats', 'todolistmember', 'reminder',
+))
+
+
+def is_sharded(model):
+    return (
+        model._meta.app_label == 'todo' and
+        model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def hashed_shard(user_id):
+    """The shard a user belongs to when they have not been moved."""
+    shards = settings.TODO_SHARDS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def db_for(user):
+    """Database alias holding the user's lists and todos.
+
+    Users moved with ``manage.py move_user_shard`` are looked up in the
+    UserShard directory, everyone else is placed by a stable hash of their
+    ID. The result is memoized on the user object for the request.
+    """
+    if not settings.TODO_SHARDS:
+        return DEFAULT_DB_ALIAS
+    alias = getattr(user, '_todo_shard', None)
+    if alias is None:
+        from todo.models import UserShard
+        alias = UserShard.objects.filter(user_id=user.pk).values_list(
+            'shard', flat=True,
+        ).first() or hashed_shard(user.pk)
+        user._todo_shard = alias
+    return alias
+
+
+class ShardRouter:
+    """Route lists and todos to their owner's shard when sharding is on.
+
+    Queries on sharded models must name their shard with ``using(db_for(
+    user))`` unless they start from an instance that is already bound to
+    one. Without shards configured the router stays out of the way.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.TODO_SHARDS:
+            return None
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return db_for(instance)
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not settings.TODO_SHARDS:
+            return None
+        if is_sharded(obj1) or is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not settings.TODO_SHARDS:
+            return None
+        if app_label == 'todo' and model_name in SHARDED_MODELS:
+            # The default database keeps empty copies of the sharded tables
+            # so deleting a user can still collect its cascades there.
+            return True
+        return db == DEFAULT_DB_ALIAS
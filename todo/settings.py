@@ -42,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todo.middleware.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'todo.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'todo.middleware.DataVersionMiddleware',
+    'todo.middleware.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,6 +75,102 @@ TEMPLATES = [
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# Render forms of inputs and textareas with the |bootstrap filter's format
+# strings instead of crispy-forms templates. The markup is the same.
+TODO_FAST_FORMS = True
+
+# Maximum number of operations accepted by a single batch request.
+TODO_BATCH_MAX_OPERATIONS = 500
+
+# Todos written per UPDATE when descriptions are edited in bulk. Larger
+# batches were not faster on SQLite, whose variable limit caps them at 333.
+TODO_BULK_EDIT_BATCH_SIZE = 100
+
+# Lists render at most this many characters of each todo description, read
+# with SUBSTR so long descriptions never leave the database. None renders
+# descriptions in full.
+TODO_DESCRIPTION_PREVIEW = None
+
+# Largest page of open todos returned by the all todos page and API.
+TODO_PAGE_SIZE = 100
+
+# Admin changelists count at most this many rows, as counting a whole table
+# means reading all of it.
+TODO_ADMIN_COUNT_LIMIT = 10000
+
+# `manage.py purge_inactive_users` deletes the lists and todos of users who
+# have not logged in for this many days.
+TODO_RETENTION_DAYS = 365
+
+# The due page lists open todos that are overdue or due within this many
+# seconds.
+TODO_DUE_SOON = 24 * 60 * 60
+
+# Resolve URLs, compile templates and connect to the database while the
+# app registry loads instead of on a worker's first request. The warm
+# connection is only reused when CONN_MAX_AGE is greater than 0.
+TODO_WARMUP = False
+
+# Token buckets for write requests, by URL name: (capacity, seconds to refill
+# an empty bucket). Buckets are kept per user and per client IP in the
+# TODO_THROTTLE_CACHE cache.
+TODO_THROTTLE_RATES = {
+    'create_list': (30, 60),
+    'duplicate_list': (10, 60),
+    'share_list': (30, 60),
+    'view_list': (120, 60),
+    'create_todo': (120, 60),
+    'edit_todo': (120, 60),
+    'batch': (30, 60),
+    'edit_descriptions': (30, 60),
+}
+TODO_THROTTLE_CACHE = 'default'
+
+# Keep the rendered login and signup pages of anonymous visitors in the
+# TODO_PAGE_SHELL_CACHE cache for this many seconds and only fill in the
+# CSRF token per request. Off while DEBUG is on so template edits show up
+# without a restart.
+TODO_PAGE_SHELLS = not DEBUG
+TODO_PAGE_SHELL_CACHE = 'default'
+TODO_PAGE_SHELL_TIMEOUT = 24 * 60 * 60
+
+# Identical GETs of list pages by one user and session share the render
+# already running in their process, and reuse its page for TODO_COALESCE_TTL
+# seconds. Each write by a user moves on a version of their data kept in the
+# TODO_COALESCE_CACHE cache, so pages rendered before it are never reused.
+# Point that cache at a shared backend when running several processes.
+# Writes by other members of a shared list show up after the TTL.
+TODO_COALESCE = True
+TODO_COALESCE_TTL = 1.0
+TODO_COALESCE_CACHE = 'default'
+
+# Profile this fraction of requests with cProfile, plus any request whose
+# TODO_PROFILE_HEADER holds a token from `manage.py profile_token`. The
+# middleware is skipped entirely when both are disabled.
+TODO_PROFILE_RATE = 0.0
+TODO_PROFILE_HEADER = None
+TODO_PROFILE_TOKEN_MAX_AGE = 60 * 60
+TODO_PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Statements slower than this are logged as JSON lines to the
+# todo.slow_queries logger, with their query plan. Parameters are left out
+# of the log while TODO_SLOW_QUERY_REDACT is on.
+TODO_SLOW_QUERY_MS = 100
+TODO_SLOW_QUERY_REDACT = True
+TODO_SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.jsonl')
+
+# Queue todo completions and edits in memory and write them in batches, at
+# most TODO_WRITE_BEHIND_INTERVAL seconds later or as soon as
+# TODO_WRITE_BEHIND_BATCH_SIZE todos are waiting. Repeated updates of a todo
+# collapse into one. Pending updates are only visible to the process that
+# queued them, so enable this with a single worker process or sticky
+# sessions. Completions from the list page are queued without checking the
+# versions the page was rendered with. Edits and deletes that carry a
+# version, as every form of the app does, are written at once and checked.
+TODO_WRITE_BEHIND = False
+TODO_WRITE_BEHIND_INTERVAL = 0.25
+TODO_WRITE_BEHIND_BATCH_SIZE = 200
+
 WSGI_APPLICATION = 'todo.wsgi.application'
 
 
@@ -84,6 +184,62 @@ DATABASES = {
     }
 }
 
+# SQLite allows one writer per file, so lists and todos can be spread over
+# TODO_SHARD_COUNT extra databases by a stable hash of their owner's ID.
+# Auth, sessions and everything else stay on the default database. With no
+# shards, everything lives on the default database. Run migrations on the
+# shards with `manage.py shard_command migrate`.
+TODO_SHARD_COUNT = 0
+TODO_SHARDS = ['shard%d' % index for index in range(TODO_SHARD_COUNT)]
+for alias in TODO_SHARDS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.%s.sqlite3' % alias),
+    }
+
+DATABASE_ROUTERS = ['todo.routers.ShardRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# The local memory cache is per process. Point this at a shared backend to
+# share throttling buckets between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/3.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.FileHandler',
+            'filename': TODO_SLOW_QUERY_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'todo.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -126,3 +282,18 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed copies of every file along with gzip
+# and brotli variants. WhiteNoise serves the hashed files with far-future
+# immutable cache headers. The manifest only exists after collectstatic,
+# so development and the test suite keep the plain storage and runserver.
+if not DEBUG:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+    )
+    STATICFILES_STORAGE = (
+        'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    )
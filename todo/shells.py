@@ -0,0 +1,84 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import crispy_forms
+import django
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template import engines
+from django.template.loader import render_to_string
+from django.utils.translation import get_language
+
+from todo import forms
+from todo.templatetags import todo_forms
+
+# Rendered in place of the CSRF token and replaced on every response.
+CSRF_PLACEHOLDER = '__todo_csrf_token__'
+
+
+def render_shell(request, template_name, form_class):
+    """Render the unbound form page of an anonymous visitor.
+
+    Everything but the CSRF token is the same for every visitor, so the
+    page is rendered once per shell version and language, kept in the
+    TODO_PAGE_SHELL_CACHE cache, and only the token is filled in per
+    request. Shells are rendered without the request, so nothing from the
+    session or the context processors can leak into them.
+    """
+    if not settings.TODO_PAGE_SHELLS:
+        return render(request, template_name, {'form': form_class()})
+    cache = caches[settings.TODO_PAGE_SHELL_CACHE]
+    key = 'todo:shell:%s:%s:%s' % (
+        shell_version(), get_language(), template_name,
+    )
+    shell = cache.get(key)
+    if shell is None:
+        shell = render_to_string(template_name, {
+            'form': form_class(),
+            'csrf_token': CSRF_PLACEHOLDER,
+        })
+        cache.set(key, shell, settings.TODO_PAGE_SHELL_TIMEOUT)
+    return HttpResponse(shell.replace(CSRF_PLACEHOLDER, get_token(request)))
+
+
+def shell_version():
+    """A digest of everything shells are rendered from.
+
+    That is every template, the forms module and the template tags that
+    render it, the TODO_FAST_FORMS setting, the static files manifest and
+    the versions of Django and crispy-forms. A deploy that changes any of
+    them starts from new cache keys, while workers running the same code
+    share their shells. Computed once per process unless DEBUG is on, so
+    edited templates show up on the next request during development.
+    """
+    if settings.DEBUG:
+        return _shell_version.__wrapped__()
+    return _shell_version()
+
+
+@lru_cache(maxsize=None)
+def _shell_version():
+    digest = hashlib.sha1()
+    for version in (django.__version__, crispy_forms.__version__,
+                    settings.CRISPY_TEMPLATE_PACK,
+                    str(settings.TODO_FAST_FORMS)):
+        digest.update(version.encode())
+    # The forms, and the template tags that render them.
+    paths = [forms.__file__, todo_forms.__file__]
+    for directory in engines['django'].template_dirs:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            paths += [os.path.join(root, name) for name in sorted(files)]
+    manifest = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest and staticfiles_storage.exists(manifest):
+        paths.append(staticfiles_storage.path(manifest))
+    # Only contents count, so hosts installed under other paths agree.
+    for path in paths:
+        with open(path, 'rb') as source:
+            digest.update(hashlib.sha1(source.read()).digest())
+    return digest.hexdigest()[:12]
@@ -0,0 +1,139 @@
+from django import forms, template
+from django.forms.widgets import Input
+from django.conf import settings
+from django.utils.html import conditional_escape, escape
+from django.utils.safestring import mark_safe
+
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+
+register = template.Library()
+
+# The Bootstrap 4 markup of crispy-forms' uni_form and field templates, as
+# format strings. Labels and help texts are not escaped, as in crispy.
+FIELD = '<div id="div_%(id)s" class="form-group%(css)s">%(label)s' \
+    ' <div class=""> %(widget)s%(errors)s%(help)s </div> </div>'
+LABEL = ' <label for="%(for)s" class="%(required)s"> %(label)s%(asterisk)s' \
+    ' </label>'
+REQUIRED = ' requiredField'
+ASTERISK = '<span class="asteriskField">*</span>'
+ERROR = ' <p id="error_%d_%s" class="invalid-feedback"><strong>%s</strong></p>'
+HELP = ' <small id="hint_%s" class="form-text text-muted">%s</small>'
+NON_FIELD_ERRORS = '<div class="alert alert-block alert-danger">' \
+    ' <ul class="m-0"> %s </ul> </div> '
+INPUT = '<input type="%s" name="%s"%s%s>'
+TEXTAREA = '<textarea name="%s"%s>\n%s</textarea>'
+
+# crispy-forms names a widget's CSS class after its class, except these.
+CLASS_NAMES = {
+    'textinput': 'textinput textInput',
+    'passwordinput': 'textinput textInput',
+}
+
+# Inputs crispy-forms renders with a layout of their own, or that render
+# more than one element.
+UNSUPPORTED = (
+    forms.CheckboxInput, forms.FileInput, forms.MultipleHiddenInput,
+)
+
+
+@register.filter
+def bootstrap(form):
+    """Render a form like ``{{ form|crispy }}``, without templates.
+
+    With TODO_FAST_FORMS off, or for forms with widgets other than inputs
+    and textareas, crispy-forms renders the form.
+    """
+    if not settings.TODO_FAST_FORMS or not supports(form):
+        return as_crispy_form(form)
+    return render_form(form)
+
+
+def supports(form):
+    return all(
+        isinstance(field.widget, (Input, forms.Textarea))
+        and not isinstance(field.widget, UNSUPPORTED)
+        for field in form.fields.values()
+    )
+
+
+def render_form(form):
+    """The Bootstrap 4 markup crispy-forms renders for ``form``."""
+    parts = [str(form.media)]
+    errors = form.non_field_errors()
+    if errors:
+        parts.append(NON_FIELD_ERRORS % '\n'.join(
+            '<li>%s</li>' % conditional_escape(error) for error in errors
+        ))
+    for bound_field in form:
+        if bound_field.is_hidden:
+            parts.append(render_widget(bound_field, {}))
+        else:
+            parts.append(render_field(bound_field))
+    return mark_safe(' '.join(parts))
+
+
+def render_field(bound_field):
+    field = bound_field.field
+    label = ''
+    if bound_field.label:
+        label = LABEL % {
+            'for': bound_field.id_for_label,
+            'required': REQUIRED if field.required else '',
+            'label': bound_field.label,
+            'asterisk': ASTERISK if field.required else '',
+        }
+    css = bound_field.css_classes()
+    return FIELD % {
+        'id': bound_field.auto_id,
+        'css': ' ' + css if css else '',
+        'label': label,
+        'widget': render_widget(bound_field, {
+            'class': css_class(bound_field),
+        }),
+        'errors': ''.join(
+            ERROR % (index, bound_field.auto_id, conditional_escape(error))
+            for index, error in enumerate(bound_field.errors, 1)
+        ),
+        'help': HELP % (bound_field.auto_id, field.help_text)
+        if field.help_text else '',
+    }
+
+
+def css_class(bound_field):
+    widget = bound_field.field.widget
+    name = type(widget).__name__.lower()
+    name = CLASS_NAMES.get(name, name)
+    css = widget.attrs.get('class', '')
+    if not css:
+        css = name
+    elif name not in css:
+        css += ' ' + name
+    css += ' form-control'
+    if bound_field.errors:
+        css += ' is-invalid'
+    return css
+
+
+def render_widget(bound_field, attrs):
+    """Render an input or textarea the way its Django template would."""
+    widget = bound_field.field.widget
+    attrs = bound_field.build_widget_attrs(attrs, widget)
+    if bound_field.auto_id and 'id' not in widget.attrs:
+        attrs.setdefault('id', bound_field.auto_id)
+    context = widget.get_context(
+        bound_field.html_name, bound_field.value(), attrs,
+    )['widget']
+    flat_attrs = ''.join(
+        ' %s' % name if value is True else ' %s="%s"' % (name, escape(value))
+        for name, value in context['attrs'].items() if value is not False
+    )
+    if isinstance(widget, forms.Textarea):
+        return TEXTAREA % (
+            escape(context['name']), flat_attrs,
+            escape(context['value']) if context['value'] else '',
+        )
+    value = context['value']
+    return INPUT % (
+        context['type'], escape(context['name']),
+        '' if value is None else ' value="%s"' % escape(value), flat_attrs,
+    )
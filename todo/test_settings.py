@@ -0,0 +1,20 @@
+"""Settings for the test suite, picked by ``manage.py test``."""
+import os
+
+from todo.settings import *  # noqa: F401,F403
+from todo.settings import BASE_DIR, DATABASES
+
+# Sharding stays off, but two shard databases are configured so tests can
+# switch it on with override_settings(TODO_SHARDS=['shard0', 'shard1']).
+for alias in ('shard0', 'shard1'):
+    DATABASES.setdefault(alias, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.%s.sqlite3' % alias),
+    })
+
+# Keep the test database in a file. Threads of ConcurrentEditsTestCase
+# write to it at once, which a shared in-memory database refuses with
+# "table is locked" instead of waiting for the lock.
+DATABASES['default']['TEST'] = {
+    'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+}
@@ -1,14 +1,52 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.staticfiles.testing import StaticLiveServerTestCase
-from django.db import IntegrityError
-from django.test import TestCase, Client, tag
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connections, transaction
+from django.test import (
+    TestCase, TransactionTestCase, Client, RequestFactory, override_settings,
+    tag,
+)
 from django.urls import reverse, resolve
+from django.utils import timezone
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.webdriver import WebDriver
 
-from todo.forms import SignupForm, TodoListForm, TodoForm
-from todo.models import Todo, TodoList
+from todo.forms import (
+    SignupForm, TodoBulkCreateForm, TodoListDuplicateForm, TodoListForm,
+    TodoForm,
+)
+from todo.coalesce import SingleFlight, bump_data_version, data_version
+from todo.middleware import profile_token
+from todo.models import (
+    Reminder, Todo, TodoList, TodoListMember, TodoListStats, UserShard,
+)
+from todo.permissions import list_access
+from todo.reminders import ReminderScheduler
+from todo.routers import ShardRouter, db_for, hashed_shard
+from todo.shells import CSRF_PLACEHOLDER, _shell_version
+from todo.templatetags.todo_forms import bootstrap, render_form
+from todo import benchmark, writebehind
+from todo.admin import VersionedAdminForm
+from todo.writebehind import WriteBehindQueue
 from todo.views import signup, home, create_list
 
 """Sonny Rivera-Ruiz Tests"""
@@ -557,6 +595,14 @@ class LoginViewTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'login.html')
 
+    def test_self_hosted_stylesheet(self):
+        """Stylesheets should be served from static files, not a CDN."""
+        response = self.client.get('/login/')
+        self.assertContains(
+            response, '/static/vendor/bootstrap/css/bootstrap.min.css',
+        )
+        self.assertNotContains(response, 'bootstrapcdn')
+
     def test_form_errors(self):
         """Error should be returned if form is not valid."""
         response = self.client.post('/login/', {
@@ -667,8 +713,7 @@ class TodoListViewTestCase(TestCase):
             'action': 'delete',
             'todo_ids': [2],
         })
-        self.assertEqual(response.status_code, 200)
-        self.assertIsNone(response.context.get('errors'))
+        self.assertRedirects(response, '/lists/1/')
         self.assertEqual(len(self.todo_list.todo_set.all()), 1)
 
     def test_complete_todo(self):
@@ -678,11 +723,303 @@ class TodoListViewTestCase(TestCase):
             'action': 'complete',
             'todo_ids': [2],
         })
-        self.assertEqual(response.status_code, 200)
-        self.assertIsNone(response.context.get('errors'))
+        self.assertRedirects(response, '/lists/1/')
         todo = Todo.objects.get(id=2)
         self.assertTrue(todo.is_complete)
 
+    def test_rows_fragment(self):
+        """Rows fragment should render the tables without the page shell."""
+        self.client.force_login(self.user)
+        self.todo_2.is_complete = True
+        self.todo_2.save()
+        response = self.client.get('/lists/1/rows/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'todo_rows.html')
+        self.assertTemplateNotUsed(response, 'authenticated.html')
+        self.assertEqual(
+            [todo.id for todo in response.context['todos']], [1],
+        )
+        self.assertEqual(
+            [todo.id for todo in response.context['completed_todos']], [2],
+        )
+
+    @override_settings(TODO_DESCRIPTION_PREVIEW=5)
+    def test_description_preview(self):
+        """Long descriptions should be cut to the preview length."""
+        self.client.force_login(self.user)
+        Todo.objects.create(description='Short', todo_list=self.todo_list)
+        response = self.client.get('/lists/1/rows/')
+        self.assertEqual(
+            [todo.description for todo in response.context['todos']],
+            ['Testi\u2026', 'Testi\u2026', 'Short'],
+        )
+
+    def test_rows_fragment_another_user(self):
+        """Rows fragment should not render lists owned by another user."""
+        user = get_user_model().objects.create_user(
+            username='another', password='password',
+        )
+        self.client.force_login(user)
+        response = self.client.get('/lists/1/rows/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_sidebar_fragment(self):
+        """Sidebar fragment should render only the user's lists."""
+        self.client.force_login(self.user)
+        response = self.client.get('/lists/sidebar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'sidebar.html')
+        self.assertTemplateNotUsed(response, 'authenticated.html')
+        self.assertEqual(
+            list(response.context['todo_lists']), [self.todo_list],
+        )
+
+
+    def test_complete_with_versions(self):
+        """Completing should bump the version of the todos."""
+        self.client.force_login(self.user)
+        response = self.client.post('/lists/1/', {
+            'action': 'complete', 'todo_ids': [1], 'version_1': 1,
+        })
+        self.assertRedirects(response, '/lists/1/')
+        self.todo_1.refresh_from_db()
+        self.assertTrue(self.todo_1.is_complete)
+        self.assertEqual(self.todo_1.version, 2)
+
+    def test_stale_versions(self):
+        """Todos changed since the page loaded should stop the action."""
+        self.client.force_login(self.user)
+        Todo.objects.filter(pk=2).update_version(1, description='Other')
+        response = self.client.post('/lists/1/', {
+            'action': 'delete', 'todo_ids': [1, 2],
+            'version_1': 1, 'version_2': 1,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.context['conflict'], 1)
+        self.assertContains(response, 'changed after the page was loaded',
+                            status_code=409)
+        self.assertEqual(Todo.objects.count(), 2)
+
+class SharedListTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username='owner', password='password',
+        )
+        self.member = user_model.objects.create_user(
+            username='member', password='password',
+        )
+        self.stranger = user_model.objects.create_user(
+            username='stranger', password='password',
+        )
+        self.todo_list = TodoList.objects.create(
+            name='Shared', user=self.owner,
+        )
+        self.todo = Todo.objects.create(
+            description='Testing', todo_list=self.todo_list,
+        )
+        self.membership = TodoListMember.objects.create(
+            todo_list=self.todo_list, user=self.member,
+        )
+        self.client = Client()
+
+    def test_read(self):
+        """Readers should see the list without the controls to change it."""
+        self.client.force_login(self.member)
+        response = self.client.get('/lists/1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['todo_list'].role, 'read')
+        self.assertEqual(
+            [todo.id for todo in response.context['todos']], [1],
+        )
+        self.assertNotContains(response, 'name="todo_ids"')
+        self.assertNotContains(response, '/lists/1/share/')
+        self.assertEqual(
+            list(response.context['todo_lists']), [self.todo_list],
+        )
+        self.assertEqual(response.context['todo_lists'][0].todo_count, 1)
+
+    def test_read_only(self):
+        """Readers should not be able to change the list."""
+        self.client.force_login(self.member)
+        response = self.client.post('/lists/1/', {
+            'action': 'delete', 'todo_ids': [1],
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/todos/1/edit/').status_code, 403)
+        self.assertEqual(
+            self.client.get('/lists/1/create/').status_code, 403,
+        )
+        response = self.client.post('/batch/', json.dumps([
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'Edited'},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Todo.objects.get().description, 'Testing')
+
+    def test_write(self):
+        """Writers should be able to change the todos."""
+        self.membership.role = TodoListMember.WRITE
+        self.membership.save()
+        self.client.force_login(self.member)
+        response = self.client.post('/todos/1/edit/', {
+            'description': 'Edited',
+        })
+        self.assertRedirects(response, '/lists/1/')
+        response = self.client.post('/lists/1/', {
+            'action': 'complete', 'todo_ids': [1],
+        })
+        self.assertRedirects(response, '/lists/1/')
+        todo = Todo.objects.get()
+        self.assertEqual(todo.description, 'Edited')
+        self.assertTrue(todo.is_complete)
+
+    def test_stranger(self):
+        """Users the list is not shared with should not find it."""
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get('/lists/1/').status_code, 404)
+        self.assertEqual(self.client.get('/lists/1/rows/').status_code, 404)
+        self.assertEqual(self.client.get('/todos/1/edit/').status_code, 404)
+        response = self.client.get('/api/todos/')
+        self.assertEqual(response.json()['todos'], [])
+
+    def test_open_todos(self):
+        """Todos of shared lists should be listed with the member's own."""
+        self.client.force_login(self.member)
+        response = self.client.get('/api/todos/')
+        self.assertEqual(
+            [todo['id'] for todo in response.json()['todos']], [1],
+        )
+
+    def test_duplicate(self):
+        """Copies made by a member should belong to the member."""
+        self.client.force_login(self.member)
+        response = self.client.post('/lists/1/duplicate/')
+        copy = TodoList.objects.get(pk=2)
+        self.assertRedirects(response, '/lists/2/')
+        self.assertEqual(copy.user, self.member)
+        self.assertEqual(copy.todo_set.count(), 1)
+
+    def test_share(self):
+        """Owners should be able to share the list and change roles."""
+        self.client.force_login(self.owner)
+        response = self.client.get('/lists/1/share/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['members'][0].user, self.member)
+        response = self.client.post('/lists/1/share/', {
+            'username': 'stranger', 'role': 'write',
+        })
+        self.assertRedirects(response, '/lists/1/share/')
+        response = self.client.post('/lists/1/share/', {
+            'username': 'member', 'role': 'write',
+        })
+        self.assertRedirects(response, '/lists/1/share/')
+        self.assertEqual(
+            list(TodoListMember.objects.order_by('pk').values_list(
+                'user__username', 'role',
+            )),
+            [('member', 'write'), ('stranger', 'write')],
+        )
+
+    def test_share_errors(self):
+        """Unknown users and the owner cannot be added."""
+        self.client.force_login(self.owner)
+        for username in ('missing', 'owner'):
+            response = self.client.post('/lists/1/share/', {
+                'username': username, 'role': 'read',
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('username', response.context['form'].errors)
+        self.assertEqual(TodoListMember.objects.count(), 1)
+
+    def test_remove(self):
+        """Removed members should lose access."""
+        self.client.force_login(self.owner)
+        response = self.client.post('/lists/1/share/', {
+            'remove': self.member.pk,
+        })
+        self.assertRedirects(response, '/lists/1/share/')
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get('/lists/1/').status_code, 404)
+
+    def test_share_owner_only(self):
+        """Only owners should be able to manage sharing."""
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get('/lists/1/share/').status_code, 403)
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get('/lists/1/share/').status_code, 404)
+
+    def test_memoized(self):
+        """Permissions should be read once per request."""
+        request = RequestFactory().get('/')
+        request.user = self.member
+        with self.assertNumQueries(1):
+            list_access(request)
+            list_access(request)
+
+    def test_delete_member(self):
+        """Deleting a user should delete their memberships."""
+        self.member.delete()
+        self.assertFalse(TodoListMember.objects.exists())
+
+class DuplicateTodoListViewTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(
+            name='Template',
+            user=self.user,
+        )
+        Todo.objects.create(description='Open', todo_list=self.todo_list)
+        Todo.objects.create(
+            description='Done', todo_list=self.todo_list, is_complete=True,
+        )
+        self.client = Client()
+
+    def test_duplicate(self):
+        """Duplicating should copy the list and every todo."""
+        copy = self.todo_list.duplicate()
+        self.assertEqual(copy.name, 'Template (copy)')
+        self.assertEqual(copy.user, self.user)
+        self.assertEqual(
+            list(copy.todo_set.order_by('id').values_list(
+                'description', 'is_complete',
+            )),
+            [('Open', False), ('Done', True)],
+        )
+        self.assertEqual(self.todo_list.todo_set.count(), 2)
+
+    def test_duplicate_reset_complete(self):
+        """Resetting should leave every copied todo open."""
+        copy = self.todo_list.duplicate(name='Copy', reset_complete=True)
+        self.assertEqual(copy.name, 'Copy')
+        self.assertFalse(copy.todo_set.filter(is_complete=True).exists())
+
+    def test_duplicate_view(self):
+        """The view should redirect to the new list."""
+        self.client.force_login(self.user)
+        response = self.client.post('/lists/1/duplicate/', {
+            'reset_complete': 'on',
+        })
+        self.assertRedirects(response, '/lists/2/')
+        self.assertEqual(
+            TodoList.objects.get(id=2).todo_set.filter(
+                is_complete=False,
+            ).count(), 2,
+        )
+
+    def test_duplicate_another_user(self):
+        """Lists owned by another user cannot be duplicated."""
+        user = get_user_model().objects.create_user(
+            username='another', password='password',
+        )
+        self.client.force_login(user)
+        response = self.client.post('/lists/1/duplicate/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(TodoList.objects.count(), 1)
+
 
 class CreateTodoListViewTestCase(TestCase):
     def setUp(self):
@@ -776,6 +1113,54 @@ class CreateTodoViewTestCase(TestCase):
         response = self.client.get('/lists/2/create/')
         self.assertEqual(response.status_code, 404)
 
+    def test_bulk_text(self):
+        """Every non-blank line should become a todo."""
+        self.client.force_login(self.user)
+        response = self.client.post('/lists/1/create/', {
+            'descriptions': 'First\n\n  Second  \r\nThird\n',
+        })
+        self.assertRedirects(response, '/lists/1/')
+        self.assertEqual(
+            list(self.todo_list.todo_set.order_by('id').values_list(
+                'description', flat=True,
+            )),
+            ['First', 'Second', 'Third'],
+        )
+
+    def test_bulk_text_blank(self):
+        """Only blank lines should be a form error."""
+        self.client.force_login(self.user)
+        response = self.client.post('/lists/1/create/', {
+            'descriptions': '\n  \n',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['bulk_form'].errors)
+        self.assertFalse(Todo.objects.exists())
+
+    def test_bulk_json(self):
+        """Valid descriptions are created and invalid ones reported."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/lists/1/create/', json.dumps(['First', '', 3, 'Second']),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(
+            [error['index'] for error in response.json()['errors']], [1, 2],
+        )
+        self.assertEqual(self.todo_list.todo_set.count(), 2)
+
+    def test_bulk_json_another_todo_list(self):
+        """Bulk creation should not reach lists owned by another user."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/lists/2/create/', json.dumps(['Sneaky']),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Todo.objects.exists())
+
 
 class EditTodoViewTestCase(TestCase):
     def setUp(self):
@@ -846,6 +1231,39 @@ class EditTodoViewTestCase(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+    def test_version_in_form(self):
+        """The form should carry the version of the todo."""
+        self.client.force_login(self.user)
+        self.create_todo()
+        response = self.client.get('/todos/1/edit/')
+        self.assertContains(response, 'name="version" value="1"')
+
+    def test_edit_conflict(self):
+        """The second of two edits from the same version should fail."""
+        self.client.force_login(self.user)
+        self.create_todo()
+        response = self.client.post('/todos/1/edit/', {
+            'description': 'First', 'version': 1,
+        })
+        self.assertRedirects(response, '/lists/1/')
+        response = self.client.post('/todos/1/edit/', {
+            'description': 'Second', 'version': 1,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.context['current'].description, 'First')
+        self.assertEqual(response.context['form']['version'].value(), 2)
+        self.assertContains(response, 'Second', status_code=409)
+        todo = Todo.objects.get(pk=1)
+        self.assertEqual(todo.description, 'First')
+        self.assertEqual(todo.version, 2)
+
+        # Saving again from the conflict page replaces the first edit.
+        response = self.client.post('/todos/1/edit/', {
+            'description': 'Second', 'version': 2,
+        })
+        self.assertRedirects(response, '/lists/1/')
+        self.assertEqual(Todo.objects.get(pk=1).description, 'Second')
+
 class SignupViewTestCase(TestCase):
     def setUp(self):
         super().setUp()
@@ -893,6 +1311,1665 @@ class SignupViewTestCase(TestCase):
         self.assertEqual(response.context['username'], 'missing@email.com')
 
 
+class BatchViewTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(
+            name='Test',
+            user=self.user,
+        )
+        self.todo = Todo.objects.create(
+            description='Testing',
+            todo_list=self.todo_list,
+        )
+        self.another_user = get_user_model().objects.create_user(
+            username='another', password='password',
+        )
+        self.another_todo_list = TodoList.objects.create(
+            name='Another',
+            user=self.another_user,
+        )
+        self.client = Client()
+
+    def post(self, payload):
+        return self.client.post(
+            '/batch/', json.dumps(payload), content_type='application/json',
+        )
+
+    def test_unauthorized_login(self):
+        """Unauthorized users should not be able to reach the endpoint."""
+        response = self.post([])
+        self.assertRedirects(response, '/login/?next=/batch/')
+
+    def test_get_not_allowed(self):
+        """Only POST requests are accepted."""
+        self.client.force_login(self.user)
+        response = self.client.get('/batch/')
+        self.assertEqual(response.status_code, 405)
+
+    def test_invalid_json(self):
+        """Bodies that are not a JSON array should be rejected."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/batch/', '{', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.post({'op': 'delete_todo'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_valid_batch(self):
+        """All operations should be applied and reported."""
+        self.client.force_login(self.user)
+        response = self.post([
+            {'op': 'create_todo', 'list_id': 1, 'description': 'New 1'},
+            {'op': 'create_todo', 'list_id': 1, 'description': 'New 2'},
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'Edited'},
+            {'op': 'complete_todo', 'todo_id': 1},
+            {'op': 'rename_list', 'list_id': 1, 'name': 'Renamed'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r['status'] == 'ok' for r in results))
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.description, 'Edited')
+        self.assertTrue(self.todo.is_complete)
+        self.todo_list.refresh_from_db()
+        self.assertEqual(self.todo_list.name, 'Renamed')
+        self.assertEqual(self.todo_list.todo_set.count(), 3)
+
+    def test_created_ids(self):
+        """Results of created todos should carry their new IDs."""
+        self.client.force_login(self.user)
+        Todo.objects.create(description='Other', todo_list=self.todo_list)
+        response = self.post([
+            {'op': 'create_todo', 'list_id': 1, 'description': 'New 1'},
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'Edited'},
+            {'op': 'create_todo', 'list_id': 1, 'description': 'New 2'},
+        ])
+        results = response.json()['results']
+        self.assertEqual(
+            Todo.objects.get(pk=results[0]['todo_id']).description, 'New 1',
+        )
+        self.assertEqual(
+            Todo.objects.get(pk=results[2]['todo_id']).description, 'New 2',
+        )
+        self.assertEqual(results[1]['todo_id'], 1)
+
+    def test_delete(self):
+        """Delete operations should remove the todo."""
+        self.client.force_login(self.user)
+        response = self.post([{'op': 'delete_todo', 'todo_id': 1}])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Todo.objects.exists())
+
+    def test_invalid_operation(self):
+        """Invalid operations reject the batch with per-operation errors."""
+        self.client.force_login(self.user)
+        response = self.post([
+            {'op': 'create_todo', 'list_id': 1, 'description': 'New'},
+            {'op': 'create_todo', 'list_id': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'ok')
+        self.assertEqual(results[1]['status'], 'invalid')
+        self.assertIn('description', results[1]['errors'])
+        self.assertEqual(Todo.objects.count(), 1)
+
+    def test_ownership_violation(self):
+        """Touching another user's list rejects the whole batch."""
+        self.client.force_login(self.user)
+        response = self.post([
+            {'op': 'complete_todo', 'todo_id': 1},
+            {'op': 'create_todo', 'list_id': 2, 'description': 'Sneaky'},
+        ])
+        self.assertEqual(response.status_code, 403)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'rejected')
+        self.assertEqual(results[1]['status'], 'forbidden')
+        self.todo.refresh_from_db()
+        self.assertFalse(self.todo.is_complete)
+        self.assertFalse(self.another_todo_list.todo_set.exists())
+
+
+    def test_version_conflict(self):
+        """A stale version rejects the batch and names the operation."""
+        self.client.force_login(self.user)
+        response = self.post([
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'New',
+             'version': 1},
+            {'op': 'rename_list', 'list_id': 1, 'name': 'New', 'version': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Todo.objects.get(pk=1).version, 2)
+        self.assertEqual(TodoList.objects.get(pk=1).version, 2)
+        response = self.post([
+            {'op': 'create_todo', 'list_id': 1, 'description': 'Newer'},
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'Newer',
+             'version': 1},
+        ])
+        self.assertEqual(response.status_code, 409)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'rejected')
+        self.assertEqual(results[1]['status'], 'conflict')
+        self.assertEqual(Todo.objects.get(pk=1).description, 'New')
+        self.assertEqual(Todo.objects.count(), 1)
+
+class EditDescriptionsViewTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(name='Test', user=self.user)
+        self.todos = [
+            Todo.objects.create(
+                description='Testing %d' % index, todo_list=self.todo_list,
+            )
+            for index in range(3)
+        ]
+        another_user = get_user_model().objects.create_user(
+            username='another', password='password',
+        )
+        self.another_todo = Todo.objects.create(
+            description='Another',
+            todo_list=TodoList.objects.create(
+                name='Another', user=another_user,
+            ),
+        )
+        self.client = Client()
+
+    def patch(self, payload):
+        return self.client.patch(
+            '/api/todos/descriptions/', json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def test_unauthorized_login(self):
+        """Unauthorized users should not be able to reach the endpoint."""
+        response = self.patch({})
+        self.assertRedirects(
+            response, '/login/?next=/api/todos/descriptions/',
+        )
+
+    def test_only_patch(self):
+        """Only PATCH requests are accepted."""
+        self.client.force_login(self.user)
+        response = self.client.post('/api/todos/descriptions/')
+        self.assertEqual(response.status_code, 405)
+
+    def test_invalid_body(self):
+        """Bodies that are not a JSON object should be rejected."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.patch(['Edited']).status_code, 400)
+        response = self.client.patch(
+            '/api/todos/descriptions/', '{',
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TODO_BULK_EDIT_BATCH_SIZE=2)
+    def test_edit(self):
+        """Descriptions should be replaced in batches with few queries."""
+        self.client.force_login(self.user)
+        # Session, user, lists, ownership, two batches, versions and a
+        # savepoint.
+        with self.assertNumQueries(9):
+            response = self.patch({
+                str(todo.pk): 'Edited %d' % todo.pk for todo in self.todos
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {
+            str(todo.pk): {'status': 'ok', 'version': 2}
+            for todo in self.todos
+        })
+        for todo in Todo.objects.filter(todo_list=self.todo_list):
+            self.assertEqual(todo.description, 'Edited %d' % todo.pk)
+            self.assertEqual(todo.version, 2)
+
+    def test_per_item_results(self):
+        """Failed items should be reported without stopping the others."""
+        self.client.force_login(self.user)
+        Todo.objects.filter(pk=2).update_version(None, description='Other')
+        response = self.patch({
+            '1': {'description': 'Edited', 'version': 1},
+            '2': {'description': 'Edited', 'version': 1},
+            '3': '',
+            str(self.another_todo.pk): 'Sneaky',
+            'x': 'Edited',
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(list(results), ['1', '2', '3', '4', 'x'])
+        self.assertEqual(results['1'], {'status': 'ok', 'version': 2})
+        self.assertEqual(results['2'], {'status': 'conflict', 'version': 2})
+        self.assertEqual(results['3']['status'], 'invalid')
+        self.assertEqual(results['4'], {'status': 'not_found'})
+        self.assertEqual(results['x']['status'], 'invalid')
+        self.assertEqual(
+            list(Todo.objects.order_by('pk').values_list(
+                'description', flat=True,
+            )),
+            ['Edited', 'Other', 'Testing 2', 'Another'],
+        )
+
+    @override_settings(TODO_WRITE_BEHIND=True)
+    def test_replaces_pending(self):
+        """Edits should win over descriptions waiting in the queue."""
+        self.client.force_login(self.user)
+        queue = WriteBehindQueue(interval=60, batch_size=100)
+        writebehind._queue = queue
+        self.addCleanup(setattr, writebehind, '_queue', None)
+        queue.enqueue('default', 1, description='Queued', is_complete=True)
+        response = self.patch({'1': 'Edited'})
+        self.assertEqual(response.status_code, 200, response.content)
+        queue.flush()
+        todo = Todo.objects.get(pk=1)
+        self.assertEqual(todo.description, 'Edited')
+        self.assertTrue(todo.is_complete)
+
+
+@override_settings(TODO_THROTTLE_RATES={'create_todo': (2, 60)})
+class ThrottleMiddlewareTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(
+            name='Test',
+            user=self.user,
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        super().tearDown()
+
+    def test_throttled_after_capacity(self):
+        """Writes beyond the bucket capacity should get a 429."""
+        for _ in range(2):
+            response = self.client.post('/lists/1/create/', {
+                'description': 'Testing',
+            })
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post('/lists/1/create/', {
+            'description': 'Testing',
+        })
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Todo.objects.count(), 2)
+
+    def test_reads_not_throttled(self):
+        """GET requests should never consume tokens."""
+        for _ in range(5):
+            response = self.client.get('/lists/1/create/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_per_ip_bucket(self):
+        """Other users from the same IP share its bucket."""
+        for _ in range(2):
+            self.client.post('/lists/1/create/', {'description': 'Testing'})
+        another = get_user_model().objects.create_user(
+            username='another', password='password',
+        )
+        TodoList.objects.create(name='Another', user=another)
+        self.client.force_login(another)
+        response = self.client.post('/lists/2/create/', {
+            'description': 'Testing',
+        })
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(
+            '/lists/2/create/', {'description': 'Testing'},
+            REMOTE_ADDR='10.0.0.1',
+        )
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(TODO_THROTTLE_RATES={'edit_descriptions': (1, 60)})
+    def test_bulk_edit_throttled(self):
+        """PATCH requests should take tokens like other writes."""
+        todo = Todo.objects.create(todo_list=self.todo_list)
+        for status_code in (200, 429):
+            response = self.client.patch(
+                '/api/todos/descriptions/', json.dumps({todo.pk: 'Edited'}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, status_code)
+
+    @override_settings(TODO_THROTTLE_RATES={'share_list': (1, 60)})
+    def test_share_throttled(self):
+        """Sharing a list should take tokens like other writes."""
+        get_user_model().objects.create_user(
+            username='member', password='password',
+        )
+        for status_code in (302, 429):
+            response = self.client.post('/lists/1/share/', {
+                'username': 'member', 'role': 'read',
+            })
+            self.assertEqual(response.status_code, status_code)
+
+
+class ProfilerMiddlewareTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def profiles(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_sampled_request(self):
+        """Sampled requests should be dumped with their URL name and user."""
+        with self.settings(TODO_PROFILE_RATE=1.0,
+                           TODO_PROFILE_DIR=self.directory):
+            response = Client().get('/login/')
+        self.assertEqual(response.status_code, 200)
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].endswith('.login.anonymous.prof'))
+
+    def test_signed_header(self):
+        """Only requests with a valid signed header should be profiled."""
+        with self.settings(TODO_PROFILE_HEADER='X-Profile',
+                           TODO_PROFILE_DIR=self.directory):
+            client = Client()
+            client.get('/login/', HTTP_X_PROFILE='forged')
+            self.assertEqual(self.profiles(), [])
+            client.get('/login/', HTTP_X_PROFILE=profile_token())
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_report(self):
+        """The report should aggregate the dumped profiles."""
+        with self.settings(TODO_PROFILE_RATE=1.0,
+                           TODO_PROFILE_DIR=self.directory):
+            client = Client()
+            client.get('/login/')
+            client.get('/signup/')
+        out = StringIO()
+        call_command(
+            'profile_report', dir=self.directory, url_name='login', stdout=out,
+        )
+        self.assertIn('Aggregated 1 profiles.', out.getvalue())
+
+    def test_report_other_files(self):
+        """Profiles named otherwise should be skipped with a warning."""
+        with self.settings(TODO_PROFILE_RATE=1.0,
+                           TODO_PROFILE_DIR=self.directory):
+            Client().get('/login/')
+        [profile] = self.profiles()
+        shutil.copy(
+            os.path.join(self.directory, profile),
+            os.path.join(self.directory, 'manual.prof'),
+        )
+        out, err = StringIO(), StringIO()
+        call_command(
+            'profile_report', dir=self.directory, stdout=out, stderr=err,
+        )
+        self.assertIn('Aggregated 1 profiles.', out.getvalue())
+        self.assertIn('manual.prof', err.getvalue())
+
+
+class BenchmarkCommandTestCase(TestCase):
+    def test_fragments(self):
+        """The fragments benchmark should render both fragments."""
+        out = StringIO()
+        call_command(
+            'benchmark_fragments', lists=2, todos=4, repeat=1, stdout=out,
+        )
+        self.assertIn('rows + sidebar', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_rows(self):
+        """The rows benchmark should run and roll its data back."""
+        out = StringIO()
+        call_command('benchmark_rows', todos=20, repeat=1, stdout=out)
+        self.assertIn('tuples', out.getvalue())
+        self.assertFalse(Todo.objects.exists())
+
+    def test_duplicate(self):
+        """The duplicate benchmark should run and roll its data back."""
+        out = StringIO()
+        call_command('benchmark_duplicate', todos=20, stdout=out)
+        self.assertIn('INSERT SELECT', out.getvalue())
+        self.assertFalse(Todo.objects.exists())
+
+
+class SlowQueryMiddlewareTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        TodoList.objects.create(name='Test', user=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def records(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    @override_settings(TODO_SLOW_QUERY_MS=0)
+    def test_logs_with_view_and_plan(self):
+        """Slow statements should be logged with their view and plan."""
+        with self.assertLogs('todo.slow_queries') as logs:
+            self.client.get('/lists/1/')
+        records = self.records(logs)
+        self.assertTrue(all(r['path'] == '/lists/1/' for r in records))
+        todos = [r for r in records if 'FROM "todo_todo"' in r['sql']]
+        self.assertTrue(todos)
+        self.assertEqual(todos[0]['view'], 'view_list')
+        self.assertIsNone(todos[0]['params'])
+        self.assertTrue(todos[0]['plan'])
+
+    @override_settings(TODO_SLOW_QUERY_MS=0, TODO_SLOW_QUERY_REDACT=False)
+    def test_unredacted_params(self):
+        """Parameters should be logged when redaction is off."""
+        with self.assertLogs('todo.slow_queries') as logs:
+            self.client.get('/lists/1/')
+        self.assertTrue(any(
+            record['params'] is not None for record in self.records(logs)
+        ))
+
+    def test_fast_queries_not_logged(self):
+        """Statements under the threshold should not be logged."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('todo.slow_queries'):
+                self.client.get('/lists/1/')
+
+
+class TodoConfigTestCase(TestCase):
+    databases = {'default', 'shard0', 'shard1'}
+
+    def test_warmup_phases(self):
+        """Warmup should report the time spent on each phase."""
+        timings = apps.get_app_config('todo').warmup()
+        self.assertEqual(set(timings), {'urls', 'templates', 'database'})
+
+    def test_warmup_databases(self):
+        """Warmup should connect to every database, shards included."""
+        connected = []
+        for alias in self.databases:
+            patcher = mock.patch.object(
+                connections[alias], 'ensure_connection',
+                lambda alias=alias: connected.append(alias),
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        apps.get_app_config('todo').warmup()
+        self.assertEqual(sorted(connected), ['default', 'shard0', 'shard1'])
+
+
+@override_settings(TODO_SHARDS=['shard0', 'shard1'])
+class ShardRouterTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.router = ShardRouter()
+
+    def test_hashed_shard_stable(self):
+        """Users should always hash to the same configured shard."""
+        for user_id in range(100):
+            shard = hashed_shard(user_id)
+            self.assertIn(shard, ['shard0', 'shard1'])
+            self.assertEqual(shard, hashed_shard(user_id))
+
+    def test_db_for_directory(self):
+        """Moved users should be found through the shard directory."""
+        hashed = hashed_shard(self.user.pk)
+        other = 'shard1' if hashed == 'shard0' else 'shard0'
+        UserShard.objects.create(user=self.user, shard=other)
+        self.assertEqual(db_for(self.user), other)
+
+    @override_settings(TODO_SHARDS=[])
+    def test_db_for_unsharded(self):
+        """Without shards everything should live on the default database."""
+        self.assertEqual(db_for(self.user), 'default')
+
+    def test_allow_migrate(self):
+        """Auth should stay on default while todo tables go everywhere."""
+        self.assertTrue(self.router.allow_migrate('default', 'auth', 'user'))
+        self.assertFalse(self.router.allow_migrate('shard0', 'auth', 'user'))
+        self.assertFalse(
+            self.router.allow_migrate('shard0', 'todo', 'usershard'),
+        )
+        for alias in ('default', 'shard0', 'shard1'):
+            self.assertTrue(self.router.allow_migrate(alias, 'todo', 'todo'))
+
+    def test_db_for_read(self):
+        """Sharded models should follow the user they are looked up by."""
+        self.assertEqual(
+            self.router.db_for_read(TodoList, instance=self.user),
+            db_for(self.user),
+        )
+        self.assertEqual(
+            self.router.db_for_read(get_user_model()), 'default',
+        )
+
+
+@override_settings(TODO_SHARDS=['shard0', 'shard1'])
+class ShardedDatabaseTestCase(TestCase):
+    databases = {'default', 'shard0', 'shard1'}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.member = get_user_model().objects.create_user(
+            username='member', password='password',
+        )
+        self.source = hashed_shard(self.user.pk)
+        self.target = 'shard1' if self.source == 'shard0' else 'shard0'
+        UserShard.objects.create(user=self.member, shard=self.source)
+        self.todo_list = TodoList.objects.using(self.source).create(
+            name='List', user=self.user,
+        )
+        self.todo = Todo.objects.using(self.source).create(
+            todo_list=self.todo_list, description='Due',
+            due_at=timezone.now(),
+        )
+        Todo.objects.using(self.source).create(
+            todo_list=self.todo_list, description='Done', is_complete=True,
+        )
+        Reminder.objects.using(self.source).create(
+            todo=self.todo, due_at=self.todo.due_at,
+        )
+        TodoListMember.objects.using(self.source).create(
+            todo_list=self.todo_list, user=self.member,
+        )
+
+    def move(self):
+        out = StringIO()
+        call_command('move_user_shard', 'user', self.target, stdout=out)
+        return out.getvalue()
+
+    def assertMoved(self):
+        self.assertFalse(
+            TodoList.objects.using(self.source).filter(user=self.user),
+        )
+        self.assertFalse(TodoListMember.objects.using(self.source).exists())
+        self.assertFalse(Todo.objects.using(self.source).exists())
+        self.assertFalse(Reminder.objects.using(self.source).exists())
+        todo_list = TodoList.objects.using(self.target).get(user=self.user)
+        stats = todo_list.stats
+        self.assertEqual((stats.total, stats.completed), (2, 1))
+        todo = todo_list.todo_set.get(description='Due')
+        self.assertEqual(
+            list(todo.reminder_set.values_list('due_at', flat=True)),
+            [self.todo.due_at],
+        )
+        return todo_list
+
+    def test_move(self):
+        """Lists, todos and reminders should end up on the target only."""
+        out = self.move()
+        self.assertIn('Copied 1 lists, 2 todos and 1 reminders', out)
+        self.assertIn('dropped 1 shares', out)
+        self.assertMoved()
+        self.assertEqual(
+            db_for(get_user_model().objects.get(pk=self.user.pk)),
+            self.target,
+        )
+        self.assertFalse(TodoList.objects.using('default').exists())
+
+    def test_move_views(self):
+        """Views should use the moved user's lists on the target."""
+        self.move()
+        todo_list = TodoList.objects.using(self.target).get(user=self.user)
+        client = Client()
+        client.login(username='user', password='password')
+        response = client.get(reverse('view_list', args=(todo_list.pk,)))
+        self.assertContains(response, 'Due')
+        client.post(reverse('create_list'), {'name': 'New'})
+        self.assertTrue(TodoList.objects.using(self.target).filter(
+            user=self.user, name='New',
+        ).exists())
+        self.assertFalse(TodoList.objects.using(self.source).filter(
+            user=self.user,
+        ).exists())
+
+    def test_rerun_interrupted(self):
+        """A rerun should clear what an interrupted move left behind."""
+        self.move()
+        # As if the source had not been cleared after the directory update.
+        todo_list = TodoList.objects.using(self.source).create(
+            name='Left over', user=self.user,
+        )
+        Todo.objects.using(self.source).create(todo_list=todo_list)
+        TodoListMember.objects.using(self.source).create(
+            todo_list=todo_list, user=self.member,
+        )
+        out = self.move()
+        self.assertIn('already on %s' % self.target, out)
+        self.assertIn(
+            'Deleted 1 lists and dropped 1 shares on %s' % self.source, out,
+        )
+        self.assertMoved()
+
+    def test_check_stats(self):
+        """check_stats should find the totals of every shard correct."""
+        self.move()
+        out = StringIO()
+        call_command('check_stats', stdout=out)
+        self.assertIn('All totals were correct.', out.getvalue())
+
+    def test_shard_command(self):
+        """shard_command should run the command on every shard."""
+        out = StringIO()
+        call_command('shard_command', 'showmigrations', 'todo', stdout=out)
+        self.assertIn('Running showmigrations on shard0', out.getvalue())
+        self.assertIn('Running showmigrations on shard1', out.getvalue())
+        self.assertIn('[X] 0001_initial', out.getvalue())
+
+
+@override_settings(TODO_WRITE_BEHIND=True)
+class WriteBehindTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(name='Test', user=self.user)
+        self.todo_1 = Todo.objects.create(
+            description='Testing 1', todo_list=self.todo_list,
+        )
+        self.todo_2 = Todo.objects.create(
+            description='Testing 2', todo_list=self.todo_list,
+        )
+        # Without a flushing thread updates are only written by flush().
+        self.queue = WriteBehindQueue(interval=60, batch_size=100)
+        writebehind._queue = self.queue
+        self.addCleanup(setattr, writebehind, '_queue', None)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_collapse(self):
+        """Repeated updates of a todo should be written once."""
+        for is_complete in (True, False, True):
+            self.queue.enqueue('default', self.todo_1.pk,
+                               is_complete=is_complete)
+        self.queue.enqueue('default', self.todo_2.pk, is_complete=True)
+        self.assertEqual(len(self.queue), 2)
+        with self.assertNumQueries(5):
+            self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(
+            Todo.objects.filter(is_complete=True).count(), 2,
+        )
+        self.assertEqual(TodoListStats.objects.get().completed, 2)
+
+    def test_read_own_writes(self):
+        """Pending completions should show up before they are written."""
+        response = self.client.post('/lists/1/', {
+            'action': 'complete',
+            'todo_ids': [2],
+        })
+        self.assertRedirects(
+            response, '/lists/1/', fetch_redirect_response=False,
+        )
+        self.assertFalse(Todo.objects.get(pk=2).is_complete)
+        response = self.client.get('/lists/1/')
+        self.assertEqual(
+            [todo.pk for todo in response.context['completed_todos']], [2],
+        )
+        self.queue.flush()
+        self.assertTrue(Todo.objects.get(pk=2).is_complete)
+
+    def test_edit(self):
+        """Edits should be queued and shown on the edit form."""
+        self.client.post('/todos/1/edit/', {'description': 'Edited'})
+        self.assertEqual(Todo.objects.get(pk=1).description, 'Testing 1')
+        response = self.client.get('/todos/1/edit/')
+        self.assertEqual(response.context['form'].initial['description'],
+                         'Edited')
+        self.queue.stop()
+        self.assertEqual(Todo.objects.get(pk=1).description, 'Edited')
+
+    def test_batch_replaces_pending(self):
+        """Direct writes from a batch should win over queued values."""
+        self.queue.enqueue('default', 1, description='Queued')
+        self.client.post('/batch/', json.dumps([
+            {'op': 'edit_todo', 'todo_id': 1, 'description': 'Batch'},
+        ]), content_type='application/json')
+        self.queue.flush()
+        self.assertEqual(Todo.objects.get(pk=1).description, 'Batch')
+
+    def test_versioned_complete(self):
+        """Completions from the list page should be queued with versions."""
+        Todo.objects.filter(pk=2).update_version(None, description='Newer')
+        response = self.client.post('/lists/1/', {
+            'action': 'complete', 'todo_ids': [2], 'version_2': 1,
+        })
+        self.assertRedirects(
+            response, '/lists/1/', fetch_redirect_response=False,
+        )
+        self.assertEqual(len(self.queue), 1)
+        self.queue.flush()
+        todo = Todo.objects.get(pk=2)
+        self.assertEqual((todo.description, todo.is_complete), ('Newer', True))
+        self.assertEqual(todo.version, 3)
+
+    def test_versioned_delete(self):
+        """Deletes should still be checked against their versions."""
+        Todo.objects.filter(pk=2).update_version(None, description='Newer')
+        response = self.client.post('/lists/1/', {
+            'action': 'delete', 'todo_ids': [2], 'version_2': 1,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Todo.objects.filter(pk=2).exists())
+
+    def test_versioned_edit(self):
+        """Edits with a version should be written at once, over queued ones.
+        """
+        self.queue.enqueue('default', 1, description='Queued')
+        response = self.client.post('/todos/1/edit/', {
+            'description': 'Checked', 'version': 1,
+        })
+        self.assertRedirects(response, '/lists/1/')
+        self.assertEqual(len(self.queue), 0)
+        todo = Todo.objects.get(pk=1)
+        self.assertEqual(todo.description, 'Checked')
+        self.assertEqual(todo.version, 2)
+
+
+class TodoListStatsTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.client.post('/lists/create/', {'name': 'Test'})
+        self.todo_list = TodoList.objects.get()
+
+    def assertTotals(self, total, completed):
+        stats = TodoListStats.objects.get(todo_list=self.todo_list)
+        self.assertEqual((stats.total, stats.completed), (total, completed))
+        self.assertEqual(TodoListStats.rebuild('default'), [])
+
+    def test_views_keep_totals(self):
+        """Every write through the views should adjust the totals."""
+        self.assertTotals(0, 0)
+        self.client.post('/lists/1/create/', {'description': 'One'})
+        self.client.post('/lists/1/create/', {'descriptions': 'Two\nThree'})
+        self.assertTotals(3, 0)
+        self.client.post('/lists/1/', {'action': 'complete', 'todo_ids': [1]})
+        self.assertTotals(3, 1)
+        self.client.post('/lists/1/', {'action': 'delete', 'todo_ids': [2]})
+        self.assertTotals(2, 1)
+        self.client.post('/batch/', json.dumps([
+            {'op': 'create_todo', 'list_id': 1, 'description': 'Four'},
+            {'op': 'complete_todo', 'todo_id': 3},
+            {'op': 'delete_todo', 'todo_id': 1},
+        ]), content_type='application/json')
+        self.assertTotals(2, 1)
+        self.client.post('/lists/1/duplicate/', {'reset_complete': 'on'})
+        copy = TodoListStats.objects.get(todo_list_id=2)
+        self.assertEqual((copy.total, copy.completed), (2, 0))
+
+    def test_dashboard(self):
+        """The dashboard should show totals without counting todos."""
+        self.client.post('/lists/1/create/', {'descriptions': 'One\nTwo'})
+        self.client.post('/lists/1/', {'action': 'complete', 'todo_ids': [1]})
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals'].open, 1)
+        self.assertEqual(response.context['totals'].completion_rate, 0.5)
+        self.assertContains(response, '50%')
+
+    def test_check_stats(self):
+        """Drifted totals should be reported and rebuilt."""
+        Todo.objects.create(todo_list=self.todo_list, description='One')
+        TodoListStats.objects.update(total=5)
+        out = StringIO()
+        call_command('check_stats', stdout=out)
+        self.assertIn(
+            'list 1 stored 5 total, 0 completed, actual 1 total, 0 completed',
+            out.getvalue(),
+        )
+        self.assertTotals(1, 0)
+
+
+class DueViewTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.now = timezone.now()
+        first = TodoList.objects.create(name='First', user=self.user)
+        second = TodoList.objects.create(name='Second', user=self.user)
+        self.overdue = Todo.objects.create(
+            todo_list=first, description='Overdue',
+            due_at=self.now - timedelta(hours=1),
+        )
+        self.soon = Todo.objects.create(
+            todo_list=second, description='Soon',
+            due_at=self.now + timedelta(hours=1),
+        )
+        Todo.objects.create(
+            todo_list=first, description='Later',
+            due_at=self.now + timedelta(days=2),
+        )
+        Todo.objects.create(
+            todo_list=first, description='Done', is_complete=True,
+            due_at=self.now - timedelta(hours=1),
+        )
+        Todo.objects.create(todo_list=first, description='Whenever')
+        other = get_user_model().objects.create_user(
+            username='other', password='password',
+        )
+        Todo.objects.create(
+            todo_list=TodoList.objects.create(name='Other', user=other),
+            description='Not mine', due_at=self.now,
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_due(self):
+        """Open todos from every list should be split by their due date."""
+        response = self.client.get('/due/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['overdue'], [self.overdue])
+        self.assertEqual(response.context['due_soon'], [self.soon])
+
+    def test_edit_due_date(self):
+        """Due dates should be editable with a datetime-local input."""
+        response = self.client.post('/todos/%d/edit/' % self.soon.id, {
+            'description': 'Soon',
+            'due_at': '2030-01-02T03:04',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.soon.refresh_from_db()
+        self.assertEqual(
+            (self.soon.due_at.year, self.soon.due_at.hour), (2030, 3),
+        )
+
+    def test_index(self):
+        """The due query should be answered from the due date index."""
+        plan = Todo.objects.filter(
+            todo_list__in=TodoList.objects.filter(
+                user=self.user,
+            ).values_list('pk', flat=True),
+            is_complete=False, due_at__lt=self.now,
+        ).explain()
+        self.assertIn('todo_open_due_list_idx', plan)
+
+
+class ReminderSchedulerTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(name='Test', user=user)
+        self.now = timezone.now()
+        self.scheduler = ReminderScheduler(
+            ['default'], horizon=timedelta(hours=1),
+        )
+
+    def todo(self, minutes, **kwargs):
+        return Todo.objects.create(
+            todo_list=self.todo_list, description='Test',
+            due_at=self.now + timedelta(minutes=minutes), **kwargs,
+        )
+
+    def test_fire_due(self):
+        """Todos should be reminded once, when they fall due."""
+        due = self.todo(-1)
+        self.todo(30)
+        self.todo(-1, is_complete=True)
+        self.assertEqual(self.scheduler.tick(self.now), 1)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(
+            list(Reminder.objects.values_list('todo_id', flat=True)),
+            [due.id],
+        )
+        restarted = ReminderScheduler(['default'], horizon=timedelta(hours=1))
+        restarted.tick(self.now)
+        self.assertEqual(Reminder.objects.count(), 1)
+
+    def test_horizon(self):
+        """Deadlines beyond the horizon should be loaded as it moves."""
+        self.todo(90)
+        self.assertEqual(self.scheduler.tick(self.now), 0)
+        self.assertEqual(len(self.scheduler), 0)
+        later = self.now + timedelta(minutes=91)
+        self.assertEqual(self.scheduler.tick(later), 1)
+
+    def test_changes(self):
+        """Changed due dates and completions should be picked up."""
+        moved = self.todo(30)
+        completed = self.todo(40)
+        self.scheduler.tick(self.now)
+        moved.due_at = self.now + timedelta(minutes=5)
+        moved.save()
+        completed.is_complete = True
+        completed.save()
+        self.todo(10)
+        with self.assertNumQueries(2):
+            self.scheduler.load(self.now + timedelta(seconds=1))
+        self.assertEqual(len(self.scheduler), 2)
+        self.assertEqual(
+            self.scheduler.tick(self.now + timedelta(minutes=20)), 2,
+        )
+        self.assertEqual(
+            set(Reminder.objects.values_list('due_at', flat=True)),
+            {self.now + timedelta(minutes=5),
+             self.now + timedelta(minutes=10)},
+        )
+
+
+class OpenTodosViewTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.open = []
+        for name in ('First', 'Second', 'Third'):
+            todo_list = TodoList.objects.create(name=name, user=self.user)
+            for index in range(3):
+                todo = Todo.objects.create(
+                    todo_list=todo_list, description='%s %d' % (name, index),
+                    is_complete=index == 1,
+                )
+                if not todo.is_complete:
+                    self.open.append(todo.id)
+        other = get_user_model().objects.create_user(
+            username='other', password='password',
+        )
+        Todo.objects.create(
+            todo_list=TodoList.objects.create(name='Other', user=other),
+            description='Not mine',
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_pages(self):
+        """Pages should walk every open todo of the user once, by list."""
+        seen = []
+        data = {'limit': 4}
+        while True:
+            response = self.client.get('/api/todos/', data)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen += [todo['id'] for todo in page['todos']]
+            if page['next'] is None:
+                break
+            data['after'] = page['next']
+        self.assertEqual(seen, self.open)
+
+    def test_filter_lists(self):
+        """Only the requested lists should be returned."""
+        response = self.client.get('/api/todos/', {'list': [1, 3]})
+        self.assertEqual(
+            [todo['list_name'] for todo in response.json()['todos']],
+            ['First', 'First', 'Third', 'Third'],
+        )
+
+    def test_invalid(self):
+        """Malformed cursors and oversized pages should be rejected."""
+        for data in ({'after': 'x'}, {'limit': 10000}, {'list': 'x'}):
+            response = self.client.get('/api/todos/', data)
+            self.assertEqual(response.status_code, 400)
+
+    def test_grouped_page(self):
+        """The page should group todos under their list."""
+        response = self.client.get('/todos/', {'limit': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Second 2')
+        self.assertNotContains(response, 'Third 0')
+        self.assertContains(response, 'after=2-6')
+
+    def test_plan(self):
+        """Pages should be read in index order without sorting."""
+        plan = TodoList.objects.filter(
+            user=self.user, todo__is_complete=False, id__gte=2,
+        ).order_by('id', 'todo__id').explain()
+        self.assertIn('todo_open_list_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@email.com', password='password',
+        )
+        self.todo_list = TodoList.objects.create(name='List', user=self.admin)
+        for index in range(4):
+            Todo.objects.create(
+                todo_list=self.todo_list, description='Todo %d' % index,
+                due_at=timezone.now(),
+            )
+        Reminder.objects.create(
+            todo_id=1, due_at=Todo.objects.get(pk=1).due_at,
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        """Changelists should not count or load rows one by one."""
+        for url in ('/admin/todo/todo/', '/admin/todo/todolist/'):
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, 'delete_selected')
+
+    def test_complete(self):
+        """Completing todos should keep the list totals."""
+        self.client.post('/admin/todo/todo/', {
+            'action': 'complete_todos', '_selected_action': [1, 2],
+        })
+        self.assertEqual(TodoListStats.objects.get().completed, 2)
+
+    def test_delete_todos(self):
+        """Deleting should ask first, then delete todos and reminders."""
+        data = {'action': 'delete_todos', '_selected_action': [1, 2]}
+        response = self.client.post('/admin/todo/todo/', data)
+        self.assertContains(response, '2 todos')
+        self.assertContains(response, 'admin/js/cancel.js')
+        self.assertContains(response, 'admin/js/jquery.init.js')
+        self.assertEqual(Todo.objects.count(), 4)
+        response = self.client.post('/admin/todo/todo/', {
+            **data, 'confirmed': 'yes',
+        })
+        self.assertRedirects(response, '/admin/todo/todo/')
+        self.assertEqual(Todo.objects.count(), 2)
+        self.assertFalse(Reminder.objects.exists())
+        self.assertEqual(TodoListStats.objects.get().total, 2)
+
+    def test_delete_lists(self):
+        """Deleting a list should delete its todos."""
+        response = self.client.post('/admin/todo/todolist/', {
+            'action': 'delete_lists', '_selected_action': [1],
+            'confirmed': 'yes',
+        })
+        self.assertRedirects(response, '/admin/todo/todolist/')
+        self.assertFalse(Todo.objects.exists())
+        self.assertFalse(TodoListStats.objects.exists())
+
+    def change_todo(self, version=1, **data):
+        return self.client.post('/admin/todo/todo/1/change/', {
+            'todo_list': self.todo_list.pk, 'description': 'Changed',
+            'due_at_0': '', 'due_at_1': '', 'opened_version': version,
+            **data,
+        })
+
+    def test_change_todo(self):
+        """Changing a todo should keep the totals and move its version on."""
+        other = TodoList.objects.create(name='Other', user=self.admin)
+        response = self.change_todo(is_complete='on', todo_list=other.pk)
+        self.assertRedirects(response, '/admin/todo/todo/')
+        todo = Todo.objects.get(pk=1)
+        self.assertEqual((todo.description, todo.version), ('Changed', 2))
+        self.assertEqual(
+            list(TodoListStats.objects.order_by('pk').values_list(
+                'total', 'completed',
+            )),
+            [(3, 0), (1, 1)],
+        )
+
+    def test_change_todo_conflict(self):
+        """Stale change forms should not overwrite newer changes."""
+        Todo.objects.filter(pk=1).update_version(None, description='New')
+        response = self.change_todo(version=1)
+        self.assertContains(response, 'changed since you opened it')
+        self.assertEqual(Todo.objects.get(pk=1).description, 'New')
+
+    def test_change_todo_race(self):
+        """Changes committed after the form checked should not be lost."""
+        Todo.objects.filter(pk=1).update_version(None, description='New')
+        # As if the change committed after the form compared the versions.
+        with mock.patch.object(
+            VersionedAdminForm, 'clean', lambda form: form.cleaned_data,
+        ):
+            response = self.change_todo(version=1, is_complete='on')
+        self.assertRedirects(
+            response, '/admin/todo/todo/1/change/',
+            fetch_redirect_response=False,
+        )
+        todo = Todo.objects.get(pk=1)
+        self.assertEqual((todo.description, todo.version), ('New', 2))
+        self.assertEqual(TodoListStats.objects.get().completed, 0)
+
+    def test_delete_todo(self):
+        """Deleting one todo should adjust the totals, dropping reminders."""
+        response = self.client.post(
+            '/admin/todo/todo/1/delete/', {'post': 'yes'},
+        )
+        self.assertRedirects(response, '/admin/todo/todo/')
+        self.assertFalse(Reminder.objects.exists())
+        self.assertEqual(TodoListStats.objects.get().total, 3)
+
+    def test_change_list(self):
+        """The owner of a list should not be changed in the admin."""
+        response = self.client.post('/admin/todo/todolist/1/change/', {
+            'name': 'Renamed', 'user': 0, 'opened_version': 1,
+        })
+        self.assertRedirects(response, '/admin/todo/todolist/')
+        todo_list = TodoList.objects.get()
+        self.assertEqual(todo_list.name, 'Renamed')
+        self.assertEqual(todo_list.user, self.admin)
+        self.assertEqual(todo_list.version, 2)
+
+    def test_delete_list_page(self):
+        """Deleting one list should ask with counts, not every todo."""
+        # Session, user, the list and counts of its todos, shares and
+        # reminders, inside the savepoint of the view.
+        with self.assertNumQueries(8):
+            response = self.client.get('/admin/todo/todolist/1/delete/')
+        self.assertContains(response, 'Todos: 4')
+        self.assertContains(response, 'Reminders: 1')
+        self.assertContains(response, 'admin/js/cancel.js')
+        self.assertNotContains(response, '/admin/todo/todo/1/change/')
+
+    def test_delete_list(self):
+        """Deleting one list should delete its todos and totals."""
+        response = self.client.post(
+            '/admin/todo/todolist/1/delete/', {'post': 'yes'},
+        )
+        self.assertRedirects(response, '/admin/todo/todolist/')
+        self.assertFalse(Todo.objects.exists())
+        self.assertFalse(Reminder.objects.exists())
+        self.assertFalse(TodoListStats.objects.exists())
+
+
+@override_settings(TODO_SHARDS=['shard0', 'shard1'])
+class ShardedAdminTestCase(TestCase):
+    databases = {'default', 'shard0', 'shard1'}
+
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@email.com', password='password',
+        )
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        UserShard.objects.create(user=self.user, shard='shard1')
+        self.todo_list = TodoList.objects.using('shard1').create(
+            name='Sharded', user=self.user,
+        )
+        Todo.objects.using('shard1').create(
+            todo_list=self.todo_list, description='Sharded todo',
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelist(self):
+        """Changelists should read the shard picked by the filter."""
+        # Session, user and the owners of the listed lists on default, the
+        # bounded count and the page on the shard.
+        with self.assertNumQueries(3), \
+                self.assertNumQueries(2, using='shard1'):
+            response = self.client.get('/admin/todo/todolist/?shard=shard1')
+        self.assertContains(response, 'Sharded')
+        self.assertContains(response, '"field-user nowrap">user</td>')
+        self.assertContains(response, 'exact=1&amp;shard=shard1')
+        response = self.client.get('/admin/todo/todolist/')
+        self.assertNotContains(response, 'Sharded')
+
+    def test_change(self):
+        """Change forms should find and save objects on their shard."""
+        url = '/admin/todo/todo/%d/change/?_changelist_filters=%s' % (
+            self.todo_list.todo_set.get().pk, 'shard%3Dshard1',
+        )
+        response = self.client.get(url)
+        self.assertContains(response, 'Sharded todo')
+        response = self.client.post(url, {
+            'todo_list': self.todo_list.pk, 'description': 'Changed',
+            'is_complete': 'on', 'due_at_0': '', 'due_at_1': '',
+            'opened_version': 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        todo = Todo.objects.using('shard1').get()
+        self.assertEqual((todo.description, todo.version), ('Changed', 2))
+        self.assertEqual(
+            TodoListStats.objects.using('shard1').get().completed, 1,
+        )
+
+    def test_actions(self):
+        """Actions should work on the rows of the picked shard."""
+        self.client.post('/admin/todo/todo/?shard=shard1', {
+            'action': 'complete_todos',
+            '_selected_action': [self.todo_list.todo_set.get().pk],
+        })
+        self.assertTrue(Todo.objects.using('shard1').get().is_complete)
+
+    def test_add_list(self):
+        """New lists should go to their owner's shard, and so should we."""
+        response = self.client.post(
+            '/admin/todo/todolist/add/?_changelist_filters=shard%3Dshard0',
+            {'name': 'Added', 'user': self.user.pk},
+        )
+        self.assertRedirects(
+            response, '/admin/todo/todolist/?shard=shard1',
+            fetch_redirect_response=False,
+        )
+        todo_list = TodoList.objects.using('shard1').get(name='Added')
+        self.assertFalse(TodoList.objects.using('default').exists())
+        response = self.client.post('/admin/todo/todolist/add/', {
+            'name': 'Continued', 'user': self.user.pk, '_continue': 'on',
+        })
+        self.assertRedirects(
+            response, '/admin/todo/todolist/%d/change/?%s' % (
+                todo_list.pk + 1, '_changelist_filters=shard%3Dshard1',
+            ),
+            fetch_redirect_response=False,
+        )
+
+
+@override_settings(TODO_PAGE_SHELLS=True)
+class PageShellTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.client = Client(enforce_csrf_checks=True)
+
+    def token(self, response):
+        match = re.search(
+            r'name="csrfmiddlewaretoken" value="([^"]+)"',
+            response.content.decode(),
+        )
+        return match.group(1)
+
+    def test_cached(self):
+        """Later visits should reuse the page without rendering it."""
+        self.client.get('/login/')
+        with self.assertTemplateNotUsed('login.html'):
+            response = self.client.get('/login/')
+        self.assertContains(response, 'Sign up now!')
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+    def test_same_page(self):
+        """Shells should only differ from a rendered page in the token."""
+        for url in ('/login/', '/signup/'):
+            self.client.get(url)
+            cached = self.client.get(url)
+            with self.settings(TODO_PAGE_SHELLS=False):
+                rendered = self.client.get(url)
+            self.assertEqual(
+                cached.content.replace(self.token(cached).encode(), b''),
+                rendered.content.replace(self.token(rendered).encode(), b''),
+            )
+
+    def test_version(self):
+        """Switching the form renderer should start from new shells."""
+        with self.settings(TODO_FAST_FORMS=True):
+            fast = _shell_version.__wrapped__()
+        with self.settings(TODO_FAST_FORMS=False):
+            self.assertNotEqual(_shell_version.__wrapped__(), fast)
+
+    def test_csrf(self):
+        """Every visitor should get a token that lets them log in."""
+        self.client.get('/login/')
+        response = self.client.get('/login/')
+        self.assertIn('csrftoken', response.cookies)
+        response = self.client.post('/login/', {
+            'username': 'user', 'password': 'password',
+            'csrfmiddlewaretoken': self.token(response),
+        })
+        self.assertRedirects(response, '/')
+
+
+class CoalesceTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        self.todo_list = TodoList.objects.create(name='Test', user=self.user)
+        Todo.objects.create(description='Testing', todo_list=self.todo_list)
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+
+    def token(self, response):
+        return re.search(
+            r'name="csrfmiddlewaretoken" value="([^"]+)"',
+            response.content.decode(),
+        ).group(1)
+
+    def test_single_flight(self):
+        """Concurrent calls for a key should share one run."""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls, results = [], []
+
+        def func():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flight.do('key', func, 60)),
+            )
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        # Threads arriving after the run get its stored result instead.
+        release.wait(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            sorted(results), [('result', False)] + [('result', True)] * 5,
+        )
+
+    def test_no_ttl(self):
+        """Without a TTL results should not be kept."""
+        flight = SingleFlight()
+        self.assertEqual(flight.do('key', lambda: 'first', 0),
+                         ('first', False))
+        self.assertEqual(flight.do('key', lambda: 'again', 0),
+                         ('again', False))
+
+    def test_failure(self):
+        """Errors should reach only the call that raised them."""
+        flight = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flight.do('key', lambda: 1 / 0, 1)
+        self.assertEqual(flight.do('key', lambda: 'ok', 1), ('ok', False))
+        self.assertEqual(flight.do('key', lambda: 'new', 1), ('ok', True))
+
+    def test_reused(self):
+        """Repeated GETs should reuse the page without rendering it."""
+        first = self.client.get('/lists/1/')
+        with self.assertNumQueries(2), \
+                self.assertTemplateNotUsed('view_list.html'):
+            second = self.client.get('/lists/1/')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(
+            first.content.replace(self.token(first).encode(), b''),
+            second.content.replace(self.token(second).encode(), b''),
+        )
+
+    def test_csrf(self):
+        """Reused pages should carry a token the request can post with."""
+        self.client.get('/lists/1/')
+        response = self.client.get('/lists/1/')
+        self.assertIn('csrftoken', response.cookies)
+        response = self.client.post('/lists/1/', {
+            'action': 'complete', 'todo_ids': [1],
+            'csrfmiddlewaretoken': self.token(response),
+        })
+        self.assertRedirects(
+            response, '/lists/1/', fetch_redirect_response=False,
+        )
+
+    def test_writes(self):
+        """Pages rendered before a write of the user should not be reused."""
+        self.client.get('/lists/1/')
+        self.client.post('/lists/1/', {
+            'action': 'complete', 'todo_ids': [1],
+            'csrfmiddlewaretoken': self.client.cookies['csrftoken'].value,
+        })
+        response = self.client.get('/lists/1/')
+        self.assertEqual(response.context['todos'], [])
+
+    def test_sessions(self):
+        """Pages should not be shared between sessions of a user."""
+        self.client.get('/lists/1/')
+        other = Client()
+        other.force_login(self.user)
+        with self.assertTemplateUsed('view_list.html'):
+            other.get('/lists/1/')
+
+    def test_only_ok(self):
+        """Error pages should be rendered for every request."""
+        self.client.get('/lists/2/')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/lists/2/').status_code, 404)
+
+    @override_settings(TODO_COALESCE=False)
+    def test_disabled(self):
+        """Without coalescing every GET should render the page."""
+        self.client.get('/lists/1/')
+        with self.assertTemplateUsed('view_list.html'):
+            self.client.get('/lists/1/')
+
+    def test_data_version(self):
+        """Every write should move the data version on, however quick."""
+        versions = [data_version(self.user)]
+        for _ in range(3):
+            bump_data_version(self.user)
+            versions.append(data_version(self.user))
+        self.assertEqual(len(set(versions)), 4)
+        cache.clear()
+        bump_data_version(self.user)
+        self.assertNotIn(data_version(self.user), versions)
+
+
+class BootstrapFilterTestCase(TestCase):
+    def test_same_markup(self):
+        """Forms should render to the markup of crispy-forms."""
+        for form_class in (
+            AuthenticationForm, SignupForm, TodoListForm, TodoForm,
+            TodoBulkCreateForm,
+            lambda: SignupForm({
+                'username': '<user>', 'email': 'invalid',
+                'password': 'password', 'password_repeated': 'other',
+            }),
+            lambda: TodoForm({'description': '', 'due_at': 'invalid'}),
+            lambda: TodoForm(initial={'description': '"Quoted" & <b>'}),
+            lambda: TodoForm(prefix='todo', auto_id=False),
+        ):
+            self.assertHTMLEqual(
+                render_form(form_class()), as_crispy_form(form_class()),
+            )
+
+    def test_fallback(self):
+        """Forms with other widgets should be rendered by crispy-forms."""
+        form = TodoListDuplicateForm()
+        self.assertIn('form-check-input', bootstrap(form))
+        with self.settings(TODO_FAST_FORMS=False):
+            self.assertHTMLEqual(
+                bootstrap(TodoForm()), as_crispy_form(TodoForm()),
+            )
+
+
+class PurgeInactiveUsersTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        user_model = get_user_model()
+        long_ago = timezone.now() - timedelta(days=400)
+        self.inactive = user_model.objects.create_user(
+            username='inactive', password='password',
+        )
+        self.active = user_model.objects.create_user(
+            username='active', password='password',
+        )
+        self.signed_in = user_model.objects.create_user(
+            username='signed_in', password='password',
+        )
+        Client().force_login(self.signed_in)
+        user_model.objects.exclude(pk=self.active.pk).update(
+            last_login=long_ago,
+        )
+        user_model.objects.filter(pk=self.active.pk).update(
+            last_login=timezone.now(),
+        )
+        for user in (self.inactive, self.active, self.signed_in):
+            for name in ('First', 'Second'):
+                todo_list = TodoList.objects.create(name=name, user=user)
+                for index in range(3):
+                    todo = Todo.objects.create(
+                        todo_list=todo_list, description=str(index),
+                        due_at=timezone.now(),
+                    )
+                    Reminder.objects.create(todo=todo, due_at=todo.due_at)
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command(
+            'purge_inactive_users', '--batch-size', '2', '--pause', '0',
+            *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_dry_run(self):
+        """A dry run should report the inactive user and delete nothing."""
+        out = self.purge('--dry-run')
+        self.assertIn('Would purge inactive: 2 lists, 6 todos.', out)
+        self.assertIn('Would purge 1 users', out)
+        self.assertEqual(Todo.objects.count(), 18)
+
+    def test_purge(self):
+        """Only the lists and todos of inactive users should be deleted."""
+        out = self.purge()
+        self.assertIn('Purged inactive: 2 lists, 6 todos.', out)
+        self.assertFalse(TodoList.objects.filter(user=self.inactive).exists())
+        self.assertFalse(TodoListStats.objects.filter(
+            user=self.inactive,
+        ).exists())
+        self.assertEqual(Todo.objects.count(), 12)
+        self.assertEqual(Reminder.objects.count(), 12)
+        self.assertTrue(
+            get_user_model().objects.filter(pk=self.inactive.pk).exists(),
+        )
+
+    def test_many_sessions(self):
+        """Sessions should be read in batches, finding every signed in user."""
+        for _ in range(5):
+            Client().force_login(self.active)
+        self.assertIn('Purged 1 users', self.purge())
+        self.assertEqual(
+            TodoList.objects.filter(user=self.signed_in).count(), 2,
+        )
+
+    def test_resume(self):
+        """A run should finish what an interrupted one started."""
+        Todo.objects.filter(
+            todo_list__user=self.inactive, description='0',
+        ).delete()
+        self.assertIn('Purged inactive: 2 lists, 4 todos.', self.purge())
+        self.assertIn('Purged 0 users', self.purge())
+
+    def test_delete_users(self):
+        """Emptied accounts should be deleted when asked to."""
+        self.purge('--delete-users')
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.inactive.pk).exists(),
+        )
+        self.assertTrue(
+            get_user_model().objects.filter(pk=self.signed_in.pk).exists(),
+        )
+
+
+class BackupDatabaseTestCase(TransactionTestCase):
+    # Backups refuse to run inside the transaction of a TestCase.
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        todo_list = TodoList.objects.create(name='List', user=user)
+        for index in range(50):
+            Todo.objects.create(todo_list=todo_list, description=str(index))
+
+    def backup(self, *args):
+        out = StringIO()
+        call_command(
+            'backup_database', self.directory, '--pages', '2', *args,
+            stdout=out, stderr=StringIO(),
+        )
+        [name] = os.listdir(self.directory)
+        return out.getvalue(), os.path.join(self.directory, name)
+
+    def count_todos(self, path):
+        with closing(sqlite3.connect(path)) as snapshot:
+            return snapshot.execute(
+                'SELECT COUNT(*) FROM todo_todo',
+            ).fetchone()[0]
+
+    def test_backup(self):
+        """The snapshot should hold the data, copied in several steps."""
+        out, path = self.backup()
+        self.assertRegex(out, r'default: [\d.]+ MiB in \d\d+ steps')
+        self.assertEqual(self.count_todos(path), 50)
+
+    def test_compress(self):
+        """Compressed snapshots should unpack to a working database."""
+        out, path = self.backup('--compress')
+        self.assertTrue(path.endswith('.sqlite3.gz'))
+        unpacked = os.path.join(self.directory, 'unpacked.sqlite3')
+        with gzip.open(path) as compressed, open(unpacked, 'wb') as target:
+            shutil.copyfileobj(compressed, target)
+        self.assertEqual(self.count_todos(unpacked), 50)
+
+    def test_compress_failed(self):
+        """A failed compression should leave no files behind."""
+        with mock.patch(
+            'todo.management.commands.backup_database.shutil.copyfileobj',
+            side_effect=OSError('No space left on device'),
+        ), self.assertRaisesMessage(OSError, 'No space left on device'):
+            self.backup('--compress')
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_unknown_database(self):
+        """Unknown aliases should be rejected."""
+        with self.assertRaisesMessage(CommandError, 'Unknown database'):
+            call_command('backup_database', self.directory,
+                         '--database', 'missing')
+
+    def test_transaction(self):
+        """Backups inside a transaction should fail instead of hanging."""
+        with transaction.atomic():
+            with self.assertRaisesMessage(CommandError, 'transaction'):
+                call_command('backup_database', self.directory)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+@tag('stress')
+class ConcurrentEditsTestCase(TransactionTestCase):
+    # Threads use their own connections, so the rows must be committed.
+    def setUp(self):
+        super().setUp()
+        _, (todo_list,) = benchmark.seed(username='user', todos=3)
+        self.pks = list(todo_list.todo_set.values_list('pk', flat=True))
+
+    def test_naive(self):
+        """Unchecked appends should lose some of each other's writes."""
+        lost, conflicts, _ = benchmark.append_concurrently(
+            self.pks, 'naive', threads=6, edits=20,
+        )
+        self.assertTrue(lost)
+        self.assertEqual(conflicts, 0)
+
+    def test_update_version(self):
+        """Appends written on the version read should never be lost."""
+        lost, _, _ = benchmark.append_concurrently(
+            self.pks, 'update', threads=6, edits=20,
+        )
+        self.assertEqual(lost, [])
+        self.assertEqual(
+            sum(Todo.objects.values_list('version', flat=True)),
+            len(self.pks) + 6 * 20,
+        )
+
+    def test_check_versions(self):
+        """Appends checked with check_versions should never be lost."""
+        lost, _, _ = benchmark.append_concurrently(
+            self.pks, 'check', threads=6, edits=20,
+        )
+        self.assertEqual(lost, [])
+
+
 class SeleniumTestCase(StaticLiveServerTestCase):
     """Base class for live server test cases."""
 
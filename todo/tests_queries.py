@@ -0,0 +1,238 @@
+"""Query budgets for every view.
+
+Every view is requested against lists holding 1, 100 and 10,000 todos. The
+number of queries has to stay within the view's budget and must not change
+with the amount of data.
+"""
+import difflib
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from todo.models import Todo, TodoList, TodoListMember
+
+SCALES = (1, 100, 10000)
+
+
+# Reused pages cost no queries, budgets are for rendering them.
+@override_settings(TODO_COALESCE=False)
+class QueryBudgetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', password='password',
+        )
+        cls.todo_lists = {}
+        for scale in SCALES:
+            todo_list = TodoList.objects.create(
+                name='%d todos' % scale, user=cls.user,
+            )
+            Todo.objects.bulk_create([
+                Todo(
+                    todo_list=todo_list,
+                    description='Todo %d' % index,
+                    is_complete=index % 2 == 1,
+                )
+                for index in range(scale)
+            ], batch_size=500)
+            cls.todo_lists[scale] = todo_list
+        cls.member = get_user_model().objects.create_user(
+            username='member', password='password',
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def first_todo(self, scale):
+        return self.todo_lists[scale].todo_set.order_by('id').first()
+
+    def assertQueryBudget(self, budget, method, build, **extra):
+        """Send the request built by ``build(scale)`` for every scale.
+
+        ``build`` returns the path and data of the request. Only the queries
+        issued while the request is handled are counted.
+        """
+        captured = []
+        for scale in SCALES:
+            path, data = build(scale)
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(self.client, method)(path, data, **extra)
+            self.assertLess(response.status_code, 400)
+            captured.append(('%d todos' % scale, [
+                query['sql'] for query in context.captured_queries
+            ]))
+        base_label, base = captured[0]
+        for label, queries in captured:
+            if len(queries) <= budget and len(queries) == len(base):
+                continue
+            diff = difflib.unified_diff(
+                base, queries, fromfile=base_label, tofile=label, lineterm='',
+            )
+            self.fail('%d queries with %s, budget is %d.\n%s\n%s' % (
+                len(queries), label, budget,
+                '\n'.join(
+                    '%d. %s' % (index, sql)
+                    for index, sql in enumerate(queries, 1)
+                ),
+                '\n'.join(diff),
+            ))
+
+    def list_path(self, path):
+        """Build requests for ``path`` formatted with each scale's list ID."""
+        return lambda scale: (path % self.todo_lists[scale].id, None)
+
+    def todo_path(self, path):
+        """Build requests for ``path`` formatted with a todo of each scale."""
+        return lambda scale: (path % self.first_todo(scale).id, None)
+
+    def test_home(self):
+        self.assertQueryBudget(3, 'get', lambda scale: ('/', None))
+
+    def test_login(self):
+        self.client.logout()
+        self.assertQueryBudget(0, 'get', lambda scale: ('/login/', None))
+
+    def test_signup(self):
+        self.client.logout()
+        self.assertQueryBudget(0, 'get', lambda scale: ('/signup/', None))
+
+    def test_logout(self):
+        def build(scale):
+            self.client.force_login(self.user)
+            return '/logout/', None
+        self.assertQueryBudget(4, 'get', build)
+
+    def test_create_list(self):
+        self.assertQueryBudget(
+            3, 'get', lambda scale: ('/lists/create/', None),
+        )
+
+    def test_create_list_post(self):
+        self.assertQueryBudget(
+            6, 'post', lambda scale: ('/lists/create/', {'name': 'New'}),
+        )
+
+    def test_view_list(self):
+        self.assertQueryBudget(5, 'get', self.list_path('/lists/%d/'))
+
+    def test_view_list_complete(self):
+        def build(scale):
+            todo_list = self.todo_lists[scale]
+            todo_ids = list(todo_list.todo_set.filter(
+                is_complete=False,
+            ).values_list('id', flat=True)[:500])
+            return '/lists/%d/' % todo_list.id, {
+                'action': 'complete', 'todo_ids': todo_ids,
+            }
+        # complete() counts what it completes by list to adjust the totals.
+        self.assertQueryBudget(9, 'post', build)
+
+    def test_duplicate_list(self):
+        def build(scale):
+            return '/lists/%d/duplicate/' % self.todo_lists[scale].id, {
+                'name': 'Copy', 'reset_complete': 'on',
+            }
+        # One INSERT ... SELECT copies the todos, whatever their number.
+        self.assertQueryBudget(10, 'post', build)
+
+    def test_list_rows(self):
+        self.assertQueryBudget(5, 'get', self.list_path('/lists/%d/rows/'))
+
+    def test_sidebar(self):
+        self.assertQueryBudget(
+            3, 'get', lambda scale: ('/lists/sidebar/', None),
+        )
+
+    def test_create_todo(self):
+        self.assertQueryBudget(3, 'get', self.list_path('/lists/%d/create/'))
+
+    def test_create_todo_post(self):
+        def build(scale):
+            return '/lists/%d/create/' % self.todo_lists[scale].id, {
+                'description': 'New',
+            }
+        self.assertQueryBudget(7, 'post', build)
+
+    def test_create_todo_bulk_post(self):
+        def build(scale):
+            return '/lists/%d/create/' % self.todo_lists[scale].id, {
+                'descriptions': '\n'.join('New %d' % i for i in range(300)),
+            }
+        self.assertQueryBudget(8, 'post', build)
+
+    def test_edit_todo(self):
+        self.assertQueryBudget(4, 'get', self.todo_path('/todos/%d/edit/'))
+
+    def test_edit_todo_post(self):
+        def build(scale):
+            return '/todos/%d/edit/' % self.first_todo(scale).id, {
+                'description': 'Edited',
+            }
+        # The todo, and the lists the user may change it through.
+        self.assertQueryBudget(5, 'post', build)
+
+    def test_edit_descriptions(self):
+        def build(scale):
+            todos = self.todo_lists[scale].todo_set.order_by('id')[:100]
+            return '/api/todos/descriptions/', json.dumps({
+                todo.id: {'description': 'Edited', 'version': todo.version}
+                for todo in todos
+            })
+        # One bulk UPDATE for up to TODO_BULK_EDIT_BATCH_SIZE descriptions.
+        self.assertQueryBudget(
+            9, 'patch', build, content_type='application/json',
+        )
+
+    def test_share_list(self):
+        def build(scale):
+            TodoListMember.objects.get_or_create(
+                todo_list=self.todo_lists[scale], user=self.member,
+            )
+            return '/lists/%d/share/' % self.todo_lists[scale].id, None
+        # The members, and their users from the default database.
+        self.assertQueryBudget(5, 'get', build)
+
+    def test_share_list_post(self):
+        def build(scale):
+            return '/lists/%d/share/' % self.todo_lists[scale].id, {
+                'username': 'member', 'role': 'write',
+            }
+        # update_or_create() reads and inserts the member inside two
+        # savepoints, four of the queries.
+        self.assertQueryBudget(10, 'post', build)
+
+    def test_dashboard(self):
+        # Totals come from the summary table, whatever the lists hold.
+        self.assertQueryBudget(4, 'get', lambda scale: ('/dashboard/', None))
+
+    def test_due(self):
+        self.assertQueryBudget(4, 'get', lambda scale: ('/due/', None))
+
+    def test_open_todos(self):
+        self.assertQueryBudget(4, 'get', lambda scale: ('/todos/', None))
+
+    def test_open_todos_api(self):
+        self.assertQueryBudget(4, 'get', lambda scale: ('/api/todos/', None))
+
+    def test_batch(self):
+        def build(scale):
+            todo_list = self.todo_lists[scale]
+            todo = self.first_todo(scale)
+            return '/batch/', json.dumps([
+                {'op': 'create_todo', 'list_id': todo_list.id,
+                 'description': 'New'},
+                {'op': 'edit_todo', 'todo_id': todo.id,
+                 'description': 'Edited'},
+                {'op': 'complete_todo', 'todo_id': todo.id},
+                {'op': 'rename_list', 'list_id': todo_list.id,
+                 'name': 'Renamed'},
+            ])
+        # SQLite needs one more query to read the IDs of created todos.
+        self.assertQueryBudget(
+            14, 'post', build, content_type='application/json',
+        )
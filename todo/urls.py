@@ -21,12 +21,30 @@ from todo import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('due/', views.due, name='due'),
     path('login/', views.login, name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('signup/', views.signup, name='signup'),
     path('lists/create/', views.create_list, name='create_list'),
     path('lists/<int:list_id>/', views.view_list, name='view_list'),
+    path('lists/<int:list_id>/rows/', views.list_rows, name='list_rows'),
+    path(
+        'lists/<int:list_id>/duplicate/', views.duplicate_list,
+        name='duplicate_list',
+    ),
+    path(
+        'lists/<int:list_id>/share/', views.share_list, name='share_list',
+    ),
+    path('lists/sidebar/', views.sidebar, name='sidebar'),
     path('lists/<int:list_id>/create/', views.create_todo, name='create_todo'),
+    path('todos/', views.open_todos, name='open_todos'),
     path('todos/<int:todo_id>/edit/', views.edit_todo, name='edit_todo'),
+    path('api/todos/', views.open_todos_api, name='open_todos_api'),
+    path(
+        'api/todos/descriptions/', views.edit_descriptions,
+        name='edit_descriptions',
+    ),
+    path('batch/', views.batch, name='batch'),
     path('admin/', admin.site.urls),
 ]
@@ -1,12 +1,88 @@
+import json
+from datetime import timedelta
+from collections import Counter, namedtuple
+
+from django.conf import settings
 from django.contrib.auth import get_user_model, login as _login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
-from django.http import HttpRequest, Http404
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Substr
+from django.http import (
+    HttpRequest, Http404, HttpResponseBadRequest, JsonResponse,
+)
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_POST, require_http_methods
 
+from todo.coalesce import coalesce
 from todo.decorators import anonymous_required
-from todo.forms import SignupForm, TodoListForm, TodoForm, TodoBulkEditForm
-from todo.models import TodoList, Todo
+from todo.forms import (
+    SignupForm, TodoListForm, TodoListDuplicateForm, ShareListForm, TodoForm,
+    TodoBulkCreateForm, TodoBulkEditForm, BatchOperationForm, OpenTodosForm,
+    validate_descriptions,
+)
+from todo.models import (
+    TodoList, TodoListMember, TodoListStats, Todo, VersionConflict,
+)
+from todo.permissions import (
+    OWNER, READ, WRITE, get_list, list_access, list_ids,
+)
+from todo.routers import db_for
+from todo.shells import render_shell
+from todo.writebehind import get_queue, no_lock
+
+
+def todo_lists_for(request):
+    """Lists shown in the sidebar, annotated with their number of todos."""
+    return list(list_access(request).values())
+
+
+TodoRow = namedtuple('TodoRow', ('id', 'description', 'due_at', 'version'))
+
+
+def todo_rows(todos):
+    """Read a queryset of todos as compact rows for rendering.
+
+    Rows are plain tuples, skipping model instantiation. When
+    TODO_DESCRIPTION_PREVIEW is set only that many characters of each
+    description are read.
+    """
+    preview = settings.TODO_DESCRIPTION_PREVIEW
+    if not preview:
+        return [TodoRow._make(row) for row in todos.values_list(
+            'id', 'description', 'due_at', 'version',
+        )]
+    rows = []
+    # One extra character tells cut descriptions apart from short ones.
+    for pk, description, due_at, version in todos.values_list(
+        'id', Substr('description', 1, preview + 1), 'due_at', 'version',
+    ):
+        if len(description) > preview:
+            description = description[:preview] + '\u2026'
+        rows.append(TodoRow(pk, description, due_at, version))
+    return rows
+
+
+def todos_for(todo_list: TodoList):
+    """The open and the completed todos of a list, ready to render.
+
+    With write-behind enabled the todos are read as instances in one query
+    and split after their pending updates are applied.
+    """
+    queue = get_queue()
+    todos = todo_list.todo_set.all()
+    if queue is None:
+        return (
+            todo_rows(todos.filter(is_complete=False)),
+            todo_rows(todos.filter(is_complete=True)),
+        )
+    todos = queue.apply(list(todos))
+    return (
+        [todo for todo in todos if not todo.is_complete],
+        [todo for todo in todos if todo.is_complete],
+    )
 
 
 @anonymous_required
@@ -17,8 +93,7 @@ def login(request: HttpRequest):
             return render(request, 'login.html', {'form': form})
         _login(request, form.get_user())
         return redirect('/')
-    form = AuthenticationForm()
-    return render(request, 'login.html', {'form': form})
+    return render_shell(request, 'login.html', AuthenticationForm)
 
 
 @anonymous_required
@@ -38,101 +113,739 @@ def signup(request: HttpRequest):
         return render(request, 'signup_success.html', {
             'username': user.get_full_name() or user.email,
         })
-    form = SignupForm()
-    return render(request, 'signup.html', {'form': form})
+    return render_shell(request, 'signup.html', SignupForm)
 
 
 @login_required()
 def home(request: HttpRequest):
     return render(request, 'home.html', {
-        'todo_lists': TodoList.objects.filter(user=request.user).all()
+        'todo_lists': todo_lists_for(request)
     })
 
 
 @login_required()
+@coalesce
 def view_list(request: HttpRequest, list_id: int = 0):
-    todo_list = get_object_or_404(TodoList, pk=list_id)
-    todos = todo_list.todo_set.filter(is_complete=False)
-    completed_todos = todo_list.todo_set.filter(is_complete=True)
+    todo_list = get_list(
+        request, list_id, WRITE if request.method == 'POST' else READ,
+    )
     context = {
-        'todo_lists': TodoList.objects.filter(user=request.user).all(),
+        'todo_lists': todo_lists_for(request),
         'todo_list': todo_list,
-        'todos': todos,
-        'completed_todos': completed_todos,
     }
     if request.method == 'POST':
-        form = TodoBulkEditForm(todos, request.POST)
+        queue = get_queue()
+        form = TodoBulkEditForm(
+            todo_list.todo_set.filter(is_complete=False) if queue is None
+            else todo_list.todo_set.all(),
+            request.POST,
+        )
         if not form.is_valid():
             context['errors'] = form.errors
+            context['todos'], context['completed_todos'] = todos_for(
+                todo_list,
+            )
             return render(request, 'view_list.html', context)
-        if form.cleaned_data['action'] == 'delete':
-            for todo in form.cleaned_data['todo_ids']:
-                todo.delete()
-        if form.cleaned_data['action'] == 'complete':
-            for todo in form.cleaned_data['todo_ids']:
-                todo.is_complete = True
-                todo.save()
-        return render(request, 'view_list.html', context)
+        selected = form.cleaned_data['todo_ids']
+        action = form.cleaned_data['action']
+        versions = form.cleaned_data['versions']
+        using = selected.db
+        if action == 'complete' and queue is not None:
+            # Write-behind wins for completions, the updates it was built
+            # for. Completing only ever sets is_complete, so skipping the
+            # version check cannot overwrite another change.
+            for todo in selected:
+                queue.enqueue(using, todo.pk, is_complete=True)
+            return redirect('view_list', todo_list.id)
+        # Queued writes cannot report a conflict, so deletes, which would
+        # drop changes made since the page was read, go to the database
+        # with their versions checked.
+        flush_lock = no_lock() if queue is None else queue.flush_lock
+        try:
+            with flush_lock, transaction.atomic(using=using):
+                selected.check_versions(versions)
+                if queue is not None:
+                    queue.discard(
+                        using, [todo.pk for todo in selected],
+                        None if action == 'delete' else ['is_complete'],
+                    )
+                if action == 'delete':
+                    selected.delete()
+                else:
+                    selected.complete()
+        except VersionConflict as conflict:
+            context['conflict'] = conflict.stale
+            context['todos'], context['completed_todos'] = todos_for(
+                todo_list,
+            )
+            return render(request, 'view_list.html', context, status=409)
+        return redirect('view_list', todo_list.id)
+    context['todos'], context['completed_todos'] = todos_for(todo_list)
     return render(request, 'view_list.html', context)
 
 
+@login_required()
+@require_POST
+def duplicate_list(request: HttpRequest, list_id: int = 0):
+    todo_list = get_list(request, list_id)
+    form = TodoListDuplicateForm(request.POST)
+    if not form.is_valid():
+        return redirect('view_list', todo_list.id)
+    queue = get_queue()
+    if queue is not None:
+        # The copy is made inside the database, which has to be current.
+        queue.flush()
+    copy = todo_list.duplicate(
+        name=form.cleaned_data['name'],
+        reset_complete=form.cleaned_data['reset_complete'],
+        user=request.user,
+    )
+    return redirect('view_list', copy.id)
+
+
+@login_required()
+def share_list(request: HttpRequest, list_id: int = 0):
+    """Show who a list is shared with, and let its owner change that."""
+    todo_list = get_list(request, list_id, OWNER)
+    members = TodoListMember.objects.using(todo_list._state.db)
+    form = ShareListForm(todo_list)
+    if request.method == 'POST' and 'remove' in request.POST:
+        try:
+            user_id = int(request.POST['remove'])
+        except ValueError:
+            return HttpResponseBadRequest('Members are given by their ID.')
+        members.filter(todo_list=todo_list, user_id=user_id).delete()
+        return redirect('share_list', todo_list.id)
+    if request.method == 'POST':
+        form = ShareListForm(todo_list, request.POST)
+        if form.is_valid():
+            members.update_or_create(
+                todo_list=todo_list, user=form.cleaned_data['username'],
+                defaults={'role': form.cleaned_data['role']},
+            )
+            return redirect('share_list', todo_list.id)
+    members = list(members.filter(todo_list=todo_list).order_by('pk'))
+    # Users may live on another database than the members.
+    users = get_user_model().objects.in_bulk(
+        [member.user_id for member in members],
+    )
+    for member in members:
+        member.user = users[member.user_id]
+    return render(request, 'share_list.html', {
+        'todo_lists': todo_lists_for(request),
+        'todo_list': todo_list,
+        'members': members,
+        'form': form,
+    })
+
+
+@login_required()
+@coalesce
+def list_rows(request: HttpRequest, list_id: int = 0):
+    """Render only the todo tables of a list for in-place page updates."""
+    todo_list = get_list(request, list_id)
+    todos, completed_todos = todos_for(todo_list)
+    return render(request, 'todo_rows.html', {
+        'todo_list': todo_list,
+        'todos': todos,
+        'completed_todos': completed_todos,
+    })
+
+
+@login_required()
+@coalesce
+def sidebar(request: HttpRequest):
+    """Render only the sidebar of todo lists for in-place page updates."""
+    return render(request, 'sidebar.html', {
+        'todo_lists': todo_lists_for(request)
+    })
+
+
+@login_required()
+def dashboard(request: HttpRequest):
+    """Todo totals per list and overall, read from the summary table."""
+    stats = list(TodoListStats.objects.using(db_for(request.user)).filter(
+        todo_list__in=list_ids(request),
+    ).select_related('todo_list').order_by('todo_list__name', 'pk'))
+    totals = TodoListStats(
+        total=sum(row.total for row in stats),
+        completed=sum(row.completed for row in stats),
+    )
+    return render(request, 'dashboard.html', {
+        'todo_lists': todo_lists_for(request),
+        'stats': stats,
+        'totals': totals,
+    })
+
+
+@login_required()
+def due(request: HttpRequest):
+    """Open todos from all of the user's lists that need attention.
+
+    Shows overdue todos and those due within TODO_DUE_SOON seconds,
+    soonest first.
+    """
+    now = timezone.now()
+    todos = Todo.objects.using(db_for(request.user)).filter(
+        todo_list__in=list_ids(request), is_complete=False,
+        due_at__lt=now + timedelta(seconds=settings.TODO_DUE_SOON),
+    ).select_related('todo_list').order_by('due_at', 'pk')
+    queue = get_queue()
+    if queue is not None:
+        todos = [
+            todo for todo in queue.apply(list(todos))
+            if not todo.is_complete and todo.due_at is not None
+        ]
+        todos.sort(key=lambda todo: (todo.due_at, todo.pk))
+    todos = list(todos)
+    return render(request, 'due.html', {
+        'todo_lists': todo_lists_for(request),
+        'overdue': [todo for todo in todos if todo.due_at < now],
+        'due_soon': [todo for todo in todos if todo.due_at >= now],
+    })
+
+
+def open_todo_page(request, lists, after, limit):
+    """A page of open todos from every list the user may open, or ``lists``.
+
+    Todos are read with one query joining the lists to their open todos,
+    ordered by list and then todo ID. Both sides come in that order from
+    the primary key and todo_open_list_idx indexes, so nothing is sorted.
+    A page starts after the (list ID, todo ID) cursor of the previous one,
+    seeking straight to its list. Returns the rows and the next cursor, or
+    None on the last page.
+    """
+    using = db_for(request.user)
+    readable = list_ids(request)
+    if lists:
+        lists = set(lists)
+        readable = [pk for pk in readable if pk in lists]
+    # Querying from the list side orders by todo_todolist.id, which SQLite
+    # reads in order from the primary key. Ordering todos by todo_list_id
+    # would sort every remaining row in a temporary B-tree instead.
+    todo_lists = TodoList.objects.using(using).filter(id__in=readable)
+    conditions = [Q(todo__is_complete=False)]
+    if after:
+        list_id, todo_id = after
+        conditions += [
+            Q(id__gte=list_id),
+            Q(id__gt=list_id) | Q(todo__id__gt=todo_id),
+        ]
+    # Conditions on todos share one join only inside a single filter().
+    rows = todo_lists.filter(*conditions).order_by('id', 'todo__id')
+    rows = [
+        {
+            'id': todo_id, 'description': description, 'due_at': due_at,
+            'list_id': list_id, 'list_name': list_name,
+        }
+        for list_id, list_name, todo_id, description, due_at
+        in rows.values_list(
+            'id', 'name', 'todo__id', 'todo__description', 'todo__due_at',
+        )[:limit + 1]
+    ]
+    cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = '%d-%d' % (rows[-1]['list_id'], rows[-1]['id'])
+    queue = get_queue()
+    if queue is not None:
+        for row in rows:
+            row.update(queue.get(using, row['id']))
+        rows = [row for row in rows if not row.pop('is_complete', False)]
+    return rows, cursor
+
+
+@login_required()
+def open_todos(request: HttpRequest):
+    """Open todos from all of the user's lists, grouped by list."""
+    form = OpenTodosForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid filters or cursor.')
+    todos, cursor = open_todo_page(
+        request, form.cleaned_data['list'], form.cleaned_data['after'],
+        form.cleaned_data['limit'],
+    )
+    next_query = None
+    if cursor:
+        query = request.GET.copy()
+        query['after'] = cursor
+        next_query = query.urlencode()
+    return render(request, 'open_todos.html', {
+        'todo_lists': todo_lists_for(request),
+        'todos': todos,
+        'next_query': next_query,
+    })
+
+
+@login_required()
+def open_todos_api(request: HttpRequest):
+    """JSON pages of open todos from all of the user's lists.
+
+    Pass the returned ``next`` cursor as ``after`` to get the next page.
+    """
+    form = OpenTodosForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    todos, cursor = open_todo_page(
+        request, form.cleaned_data['list'], form.cleaned_data['after'],
+        form.cleaned_data['limit'],
+    )
+    return JsonResponse({'todos': todos, 'next': cursor})
+
+
 @login_required()
 def create_list(request: HttpRequest):
-    context = {
-        'todo_lists': TodoList.objects.filter(user=request.user).all()
-    }
     if request.method == 'POST':
         form = TodoListForm(request.POST)
         if not form.is_valid():
-            context['form'] = form
-            return render(request, 'create_list.html', context)
+            return render(request, 'create_list.html', {
+                'todo_lists': todo_lists_for(request),
+                'form': form,
+            })
         todo_list = form.save(commit=False)
         todo_list.user = request.user
-        todo_list.save()
+        using = db_for(request.user)
+        with transaction.atomic(using=using):
+            todo_list.save(using=using)
         return redirect('view_list', todo_list.id)
-    form = TodoListForm()
-    context['form'] = form
-    return render(request, 'create_list.html', context)
+    return render(request, 'create_list.html', {
+        'todo_lists': todo_lists_for(request),
+        'form': TodoListForm(),
+    })
 
 
 @login_required()
 def create_todo(request: HttpRequest, list_id: int = 0):
     context = {
-        'todo_lists': TodoList.objects.filter(user=request.user).all()
+        'todo_lists': todo_lists_for(request)
     }
-    todo_list = get_object_or_404(TodoList, pk=list_id)
-    if todo_list.user != request.user:
-        raise Http404
+    todo_list = get_list(request, list_id, WRITE)
+    if request.method == 'POST' and request.content_type == 'application/json':
+        return create_todos_json(request, todo_list)
+    if request.method == 'POST' and 'descriptions' in request.POST:
+        return create_todos_text(request, todo_list, context)
     if request.method == 'POST':
         form = TodoForm(request.POST)
         if not form.is_valid():
             context['form'] = form
+            context['bulk_form'] = TodoBulkCreateForm()
             return render(request, 'create_todo.html', context)
         todo = form.save(commit=False)
         todo.todo_list = todo_list
-        todo.save()
+        with transaction.atomic(using=todo_list._state.db):
+            todo.save(using=todo_list._state.db)
         return redirect('view_list', todo_list.id)
-    form = TodoForm()
-    context['form'] = form
+    context['form'] = TodoForm()
+    context['bulk_form'] = TodoBulkCreateForm()
     return render(request, 'create_todo.html', context)
 
 
+def bulk_create_todos(todo_list: TodoList, descriptions):
+    """Insert a todo for each description in a single transaction."""
+    using = todo_list._state.db
+    with transaction.atomic(using=using):
+        Todo.objects.using(using).bulk_create([
+            Todo(todo_list=todo_list, description=description)
+            for description in descriptions
+        ])
+        TodoListStats.adjust(using, {todo_list.pk: (len(descriptions), 0)})
+
+
+def create_todos_text(request: HttpRequest, todo_list: TodoList, context):
+    """Create todos from newline separated descriptions.
+
+    Valid lines are created. Invalid lines are put back into the form along
+    with their errors.
+    """
+    context['form'] = TodoForm()
+    bulk_form = TodoBulkCreateForm(request.POST)
+    if not bulk_form.is_valid():
+        context['bulk_form'] = bulk_form
+        return render(request, 'create_todo.html', context)
+    lines = bulk_form.cleaned_data['descriptions']
+    valid, errors = validate_descriptions(lines)
+    bulk_create_todos(todo_list, valid)
+    if not errors:
+        return redirect('view_list', todo_list.id)
+    bulk_form = TodoBulkCreateForm({
+        'descriptions': '\n'.join(lines[index] for index in errors),
+    })
+    for index, messages in errors.items():
+        for message in messages:
+            bulk_form.add_error(None, '"%s": %s' % (lines[index], message))
+    context['bulk_form'] = bulk_form
+    context['created'] = len(valid)
+    return render(request, 'create_todo.html', context)
+
+
+def create_todos_json(request: HttpRequest, todo_list: TodoList):
+    """Create todos from a JSON array of descriptions.
+
+    Valid descriptions are created and the errors of the others are
+    returned by their index in the array.
+    """
+    try:
+        descriptions = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Body must be valid JSON.'}, status=400)
+    if not isinstance(descriptions, list):
+        return JsonResponse(
+            {'error': 'Body must be a JSON array of descriptions.'},
+            status=400,
+        )
+    if len(descriptions) > settings.TODO_BATCH_MAX_OPERATIONS:
+        return JsonResponse({
+            'error': 'At most %d todos can be created at once.' % (
+                settings.TODO_BATCH_MAX_OPERATIONS
+            ),
+        }, status=400)
+    valid, errors = validate_descriptions(descriptions)
+    bulk_create_todos(todo_list, valid)
+    return JsonResponse({
+        'created': len(valid),
+        'errors': [
+            {'index': index, 'errors': messages}
+            for index, messages in errors.items()
+        ],
+    })
+
+
 @login_required()
 def edit_todo(request: HttpRequest, todo_id: int = 0):
     context = {
-        'todo_lists': TodoList.objects.filter(user=request.user).all()
+        'todo_lists': todo_lists_for(request)
     }
-    todo = get_object_or_404(Todo, pk=todo_id)
-    if todo.todo_list.user != request.user:
-        raise Http404
+    todo = get_object_or_404(
+        Todo.objects.using(db_for(request.user)), pk=todo_id,
+    )
+    todo.todo_list = get_list(request, todo.todo_list_id, WRITE)
+    queue = get_queue()
+    if queue is not None:
+        queue.apply([todo])
     if request.method == 'POST':
         form = TodoForm(request.POST, instance=todo)
         if not form.is_valid():
             context['form'] = form
             return render(request, 'edit_todo.html', context)
-        todo = form.save()
-        return redirect('view_list', todo.todo_list.id)
-    form = TodoForm(instance=todo)
+        version = form.cleaned_data['version']
+        if queue is not None and version is None:
+            queue.enqueue(todo._state.db, todo.pk, **{
+                field: form.cleaned_data[field] for field in form.changed_data
+                if field != 'version'
+            })
+            return redirect('view_list', todo.todo_list_id)
+        using = todo._state.db
+        fields = {
+            field: form.cleaned_data[field]
+            for field in ('description', 'due_at')
+        }
+        # Queued writes cannot report a conflict, so edits that carry a
+        # version go to the database like batches do.
+        flush_lock = no_lock() if queue is None else queue.flush_lock
+        with flush_lock:
+            if queue is not None:
+                queue.discard(using, [todo.pk], list(fields))
+            updated = Todo.objects.using(using).filter(
+                pk=todo.pk,
+            ).update_version(version, updated_at=timezone.now(), **fields)
+        if not updated:
+            return edit_conflict(request, todo, context)
+        return redirect('view_list', todo.todo_list_id)
+    form = TodoForm(instance=todo, initial={'version': todo.version})
     context['form'] = form
     return render(request, 'edit_todo.html', context)
 
+
+def edit_conflict(request: HttpRequest, todo: Todo, context):
+    """Show an edit that lost the race next to the todo as it is now.
+
+    The form keeps what was submitted but takes the current version, so
+    submitting it again replaces the other change on purpose.
+    """
+    current = Todo.objects.using(todo._state.db).filter(pk=todo.pk).first()
+    if current is None:
+        raise Http404
+    data = request.POST.copy()
+    data['version'] = current.version
+    # Validation copies the submitted values onto the instance, which must
+    # not be the one shown as saved.
+    form = TodoForm(data, instance=todo)
+    form.is_valid()
+    form.add_error(None, 'This todo was changed after you opened it. Save '
+                         'again to replace that change with yours.')
+    context['form'] = form
+    context['current'] = current
+    return render(request, 'edit_todo.html', context, status=409)
+
+
+@login_required()
+@require_POST
+def batch(request: HttpRequest):
+    """Apply a JSON array of operations in a single transaction.
+
+    Every list and todo referenced by the batch is checked up front. If any
+    operation is invalid or touches data the user may not change, nothing
+    is applied. Operations are grouped by type and applied with
+    bulk queries in the order: create, edit, rename, complete, delete.
+    Results of ``create_todo`` operations carry the new ``todo_id``.
+
+    Operations may carry the ``version`` of the todo, or list, they were
+    based on. If any of those has changed since, nothing is applied either
+    and the stale operations are reported as conflicts.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Body must be valid JSON.'}, status=400)
+    if not isinstance(payload, list):
+        return JsonResponse(
+            {'error': 'Body must be a JSON array of operations.'}, status=400,
+        )
+    if len(payload) > settings.TODO_BATCH_MAX_OPERATIONS:
+        return JsonResponse({
+            'error': 'Batches are limited to %d operations.' % (
+                settings.TODO_BATCH_MAX_OPERATIONS
+            ),
+        }, status=400)
+
+    operation_forms = [
+        BatchOperationForm(data if isinstance(data, dict) else {})
+        for data in payload
+    ]
+    if not all([form.is_valid() for form in operation_forms]):
+        return JsonResponse({'results': [
+            {'index': index, 'status': 'ok'} if form.is_valid() else
+            {'index': index, 'status': 'invalid', 'errors': form.errors}
+            for index, form in enumerate(operation_forms)
+        ]}, status=400)
+    operations = [form.cleaned_data for form in operation_forms]
+
+    using = db_for(request.user)
+    writable = list_ids(request, WRITE)
+    referenced = {op['list_id'] for op in operations if op['list_id']}
+    todo_lists = {
+        pk: list_access(request)[pk] for pk in writable if pk in referenced
+    }
+    todo_ids = {op['todo_id'] for op in operations if op['todo_id']}
+    todos = Todo.objects.using(using).filter(
+        todo_list__in=writable,
+    ).in_bulk(todo_ids)
+
+    forbidden = [
+        index for index, op in enumerate(operations)
+        if (op['list_id'] and op['list_id'] not in todo_lists) or
+        (op['todo_id'] and op['todo_id'] not in todos)
+    ]
+    if forbidden:
+        return JsonResponse({'results': [
+            {'index': index, 'status': 'forbidden' if index in forbidden
+             else 'rejected'}
+            for index in range(len(operations))
+        ]}, status=403)
+
+    created, created_results, edited, renamed = [], [], {}, {}
+    completed, deleted = set(), set()
+    todo_versions, list_versions = {}, {}
+    results = []
+    for index, op in enumerate(operations):
+        if op['version'] is not None and op['todo_id']:
+            todo_versions[op['todo_id']] = op['version']
+        elif op['version'] is not None and op['op'] == 'rename_list':
+            list_versions[op['list_id']] = op['version']
+        if op['op'] == 'create_todo':
+            created.append(Todo(
+                todo_list=todo_lists[op['list_id']],
+                description=op['description'],
+            ))
+            # The ID of the new todo is filled in once it is inserted.
+            created_results.append(index)
+        elif op['op'] == 'edit_todo':
+            todo = todos[op['todo_id']]
+            todo.description = op['description']
+            todo.version = F('version') + 1
+            edited[todo.id] = todo
+        elif op['op'] == 'rename_list':
+            todo_list = todo_lists[op['list_id']]
+            todo_list.name = op['name']
+            todo_list.version = F('version') + 1
+            renamed[todo_list.id] = todo_list
+        elif op['op'] == 'complete_todo':
+            completed.add(op['todo_id'])
+        elif op['op'] == 'delete_todo':
+            deleted.add(op['todo_id'])
+        result = {'index': index, 'op': op['op'], 'status': 'ok'}
+        if op['list_id']:
+            result['list_id'] = op['list_id']
+        if op['todo_id']:
+            result['todo_id'] = op['todo_id']
+        results.append(result)
+
+    queue = get_queue()
+    flush_lock = no_lock() if queue is None else queue.flush_lock
+    todo_manager = Todo.objects.using(using)
+    list_manager = TodoList.objects.using(using)
+    # Batches write directly. Queued values they replace are dropped, and
+    # holding the flush lock keeps an older flush from committing after
+    # them.
+    try:
+        with flush_lock, transaction.atomic(using=using):
+            # Checked first, so nothing is written when a version is stale.
+            todo_manager.check_versions(todo_versions)
+            list_manager.check_versions(list_versions)
+            if queue is not None:
+                queue.discard(using, edited, ['description'])
+                queue.discard(using, completed, ['is_complete'])
+                queue.discard(using, deleted)
+            if created:
+                todo_manager.bulk_create(created)
+                if created[0].pk is None:
+                    # SQLite does not return the IDs of bulk inserts. Its
+                    # write lock is held until the transaction ends, so the
+                    # newest IDs are the rows just inserted, in order.
+                    new_ids = list(todo_manager.order_by('-pk').values_list(
+                        'pk', flat=True,
+                    )[:len(created)])
+                    for todo, pk in zip(created, reversed(new_ids)):
+                        todo.pk = pk
+                TodoListStats.adjust(using, {
+                    list_id: (count, 0) for list_id, count in
+                    Counter(todo.todo_list_id for todo in created).items()
+                })
+            if edited:
+                todo_manager.bulk_update(
+                    edited.values(), ['description', 'version'],
+                )
+            if renamed:
+                list_manager.bulk_update(renamed.values(), ['name', 'version'])
+            if completed:
+                todo_manager.filter(pk__in=completed).complete()
+            if deleted:
+                todo_manager.filter(pk__in=deleted).delete()
+    except VersionConflict:
+        current = {
+            'todo': dict(todo_manager.filter(
+                pk__in=todo_versions,
+            ).values_list('pk', 'version')),
+            'list': dict(list_manager.filter(
+                pk__in=list_versions,
+            ).values_list('pk', 'version')),
+        }
+        stale = {
+            index for index, op in enumerate(operations)
+            if op['version'] is not None and (
+                current['todo'].get(op['todo_id']) if op['todo_id']
+                else current['list'].get(op['list_id'])
+            ) != op['version']
+        }
+        return JsonResponse({'results': [
+            {'index': index, 'status': 'conflict' if index in stale
+             else 'rejected'}
+            for index in range(len(operations))
+        ]}, status=409)
+    for index, todo in zip(created_results, created):
+        results[index]['todo_id'] = todo.pk
+    return JsonResponse({'results': results})
+
+
+@login_required()
+@require_http_methods(['PATCH'])
+def edit_descriptions(request: HttpRequest):
+    """Replace the descriptions of many todos with one request.
+
+    The body is a JSON object mapping todo IDs to their new description,
+    or to an object with a ``description`` and the ``version`` it replaces.
+    Edits are applied or refused one by one and every ID gets a result:
+    ``ok`` with the new version, ``invalid``, ``not_found`` for todos the
+    user may not change, or ``conflict`` with the current version.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Body must be valid JSON.'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({
+            'error': 'Body must be a JSON object mapping todo IDs to '
+                     'descriptions.',
+        }, status=400)
+    if len(payload) > settings.TODO_BATCH_MAX_OPERATIONS:
+        return JsonResponse({
+            'error': 'At most %d todos can be edited at once.' % (
+                settings.TODO_BATCH_MAX_OPERATIONS
+            ),
+        }, status=400)
+
+    # Results are reported in the order of the request.
+    results = dict.fromkeys(payload)
+    keys, submitted = {}, {}
+    for key, value in payload.items():
+        version = None
+        if isinstance(value, dict):
+            version = value.get('version')
+            value = value.get('description')
+        try:
+            pk = int(key)
+        except ValueError:
+            results[key] = {
+                'status': 'invalid', 'errors': ['Todo IDs must be numbers.'],
+            }
+            continue
+        if pk in keys:
+            results[key] = {
+                'status': 'invalid', 'errors': ['Todo is given twice.'],
+            }
+            continue
+        if version is not None and type(version) is not int:
+            results[key] = {
+                'status': 'invalid', 'errors': ['Versions must be numbers.'],
+            }
+            continue
+        keys[pk] = key
+        submitted[pk] = (value, version)
+    pks = list(submitted)
+    valid, errors = validate_descriptions(
+        [submitted[pk][0] for pk in pks],
+    )
+    for index, messages in errors.items():
+        results[keys[pks[index]]] = {'status': 'invalid', 'errors': messages}
+    valid = iter(valid)
+    edits = {
+        pk: next(valid) for index, pk in enumerate(pks) if index not in errors
+    }
+
+    using = db_for(request.user)
+    todos = Todo.objects.using(using).filter(
+        todo_list__in=list_ids(request, WRITE), pk__in=edits,
+    )
+    queue = get_queue()
+    flush_lock = no_lock() if queue is None else queue.flush_lock
+    with flush_lock, transaction.atomic(using=using):
+        if any(submitted[pk][1] is not None for pk in edits):
+            # Takes SQLite's write lock, so no version can change between
+            # reading and updating them.
+            todos.update(version=F('version'))
+        # Access to every todo is checked by this one query.
+        current = dict(todos.values_list('pk', 'version'))
+        changed = []
+        for pk, description in edits.items():
+            version = current.get(pk)
+            if version is None:
+                results[keys[pk]] = {'status': 'not_found'}
+            elif submitted[pk][1] not in (None, version):
+                results[keys[pk]] = {'status': 'conflict', 'version': version}
+            else:
+                changed.append(Todo(pk=pk, description=description))
+                results[keys[pk]] = {'status': 'ok', 'version': version + 1}
+        if queue is not None:
+            queue.discard(using, [todo.pk for todo in changed],
+                          ['description'])
+        # bulk_update builds a CASE per field and row in Python, so only
+        # descriptions go through it. The rest is the same for every todo.
+        todo_manager = Todo.objects.using(using)
+        todo_manager.bulk_update(
+            changed, ['description'],
+            batch_size=settings.TODO_BULK_EDIT_BATCH_SIZE,
+        )
+        todo_manager.filter(pk__in=[todo.pk for todo in changed]).update(
+            updated_at=timezone.now(), version=F('version') + 1,
+        )
+    return JsonResponse({'results': results})
@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from todo.models import Todo, TodoListStats
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """The process wide write-behind queue, or None when it is disabled.
+
+    The queue and its flushing thread are created on first use and drained
+    when the interpreter exits.
+    """
+    global _queue
+    if not settings.TODO_WRITE_BEHIND:
+        return None
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue(
+                settings.TODO_WRITE_BEHIND_INTERVAL,
+                settings.TODO_WRITE_BEHIND_BATCH_SIZE,
+            )
+            _queue.start()
+            atexit.register(_queue.stop)
+    return _queue
+
+
+@contextmanager
+def no_lock():
+    """Stand in for a queue's flush lock while write-behind is disabled.
+
+    ``contextlib.nullcontext`` would do, but it needs Python 3.7.
+    """
+    yield
+
+
+class WriteBehindQueue:
+    """Collapse todo updates in memory and write them in batches.
+
+    Updates are kept per ``(database, todo id)``. Later values of a field
+    replace earlier ones, so toggling a todo ten times costs one UPDATE.
+    A background thread flushes every ``interval`` seconds, or sooner once
+    ``batch_size`` todos are waiting, with one transaction per database.
+
+    Pending updates only exist in this process. Views overlay them on the
+    todos they read with ``apply()`` so a client sees its own writes.
+    """
+
+    def __init__(self, interval, batch_size):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending = {}
+        # Updates taken by a flush that has not committed yet. They stay
+        # visible to readers until it does.
+        self.flushing = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+    def enqueue(self, using, pk, **fields):
+        with self.lock:
+            self.pending.setdefault((using, pk), {}).update(fields)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def discard(self, using, pks, fields=None):
+        """Drop pending updates superseded by a direct write.
+
+        Only the given fields are dropped, or every field when None.
+        """
+        with self.lock:
+            for pk in pks:
+                update = self.pending.get((using, pk))
+                if update is None:
+                    continue
+                for field in list(update) if fields is None else fields:
+                    update.pop(field, None)
+                if not update:
+                    del self.pending[(using, pk)]
+
+    def get(self, using, pk):
+        """The pending field values of a todo."""
+        with self.lock:
+            return {
+                **self.flushing.get((using, pk), {}),
+                **self.pending.get((using, pk), {}),
+            }
+
+    def apply(self, todos):
+        """Set the pending field values on todo instances, in place."""
+        with self.lock:
+            for todo in todos:
+                key = (todo._state.db, todo.pk)
+                for source in (self.flushing, self.pending):
+                    for field, value in source.get(key, {}).items():
+                        setattr(todo, field, value)
+        return todos
+
+    def flush(self):
+        """Write every pending update, returning the number of todos."""
+        with self.flush_lock:
+            with self.lock:
+                self.flushing, self.pending = self.pending, {}
+            if not self.flushing:
+                return 0
+            by_database = {}
+            for (using, pk), fields in self.flushing.items():
+                # Todos given the same values share a single UPDATE.
+                values = tuple(sorted(fields.items()))
+                by_database.setdefault(using, {}).setdefault(
+                    values, [],
+                ).append(pk)
+            try:
+                for using, groups in by_database.items():
+                    todos = Todo.objects.using(using)
+                    with transaction.atomic(using=using):
+                        for values, pks in groups.items():
+                            self.write(todos, pks, dict(values))
+            except Exception:
+                logger.exception('Could not write %d pending todo updates.',
+                                 len(self.flushing))
+                with self.lock:
+                    # Newer updates win over the ones being retried.
+                    for key, fields in self.flushing.items():
+                        self.pending[key] = {
+                            **fields, **self.pending.get(key, {}),
+                        }
+                    self.flushing = {}
+                return 0
+            with self.lock:
+                count = len(self.flushing)
+                self.flushing = {}
+            return count
+
+    @staticmethod
+    def write(todos, pks, fields):
+        """Update todos, keeping the list totals in step with completions."""
+        # Stay below SQLite's limit of 999 parameters.
+        for start in range(0, len(pks), 500):
+            chunk = todos.filter(pk__in=pks[start:start + 500])
+            if 'is_complete' in fields:
+                is_complete = fields['is_complete']
+                changing = TodoListStats.count(
+                    chunk.exclude(is_complete=is_complete),
+                )
+                TodoListStats.adjust(todos.db, {
+                    list_id: (0, total if is_complete else -total)
+                    for list_id, (total, _) in changing.items()
+                })
+            chunk.update(
+                updated_at=timezone.now(), version=F('version') + 1,
+                **fields,
+            )
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='todo-write-behind', daemon=True,
+        )
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+        connections.close_all()
+
+    def stop(self):
+        """Stop the flushing thread and write what is still pending."""
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()